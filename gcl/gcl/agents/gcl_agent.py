@@ -1,7 +1,7 @@
 from abc import ABCMeta
 from typing import Optional, List, Union
 from functools import reduce
-from itertools import accumulate
+from itertools import accumulate, chain
 
 import numpy as np
 import torch
@@ -97,17 +97,50 @@ class GCL_Agent(BaseAgent, metaclass=ABCMeta):
         :type: dict
         """
         # unpack rollouts into obs, act, log_probs
-        demo_obs = [demo_path['observation'] for demo_path in demo_batch]
-        demo_acs = [demo_path['action'] for demo_path in demo_batch]
-        sample_obs = [sample_path['observation'] for sample_path in sample_batch]
-        sample_acs = [sample_path['action'] for sample_path in sample_batch]
-        sample_log_probs = [sample_path['log_prob'] for sample_path in sample_batch]
+        # single traversal per batch instead of one comprehension per field;
+        # batches may also arrive pre-converted as (obs, acs, log_prob) tensor
+        # tuples from build_background_tensors
+        demo_obs, demo_acs = [], []
+        for demo_path in demo_batch:
+            if isinstance(demo_path, tuple):
+                demo_obs.append(demo_path[0])
+                demo_acs.append(demo_path[1])
+            else:
+                demo_obs.append(demo_path['observation'])
+                demo_acs.append(demo_path['action'])
+
+        sample_obs, sample_acs, sample_log_probs = [], [], []
+        for sample_path in sample_batch:
+            if isinstance(sample_path, tuple):
+                sample_ob, sample_ac, sample_log_prob = sample_path
+            else:
+                sample_ob = sample_path['observation']
+                sample_ac = sample_path['action']
+                sample_log_prob = sample_path['log_prob']
+            sample_obs.append(sample_ob)
+            sample_acs.append(sample_ac)
+            sample_log_probs.append(sample_log_prob)
 
         # Estimate gradient loss and update parameters
         reward_log = self.reward.update(demo_obs, demo_acs, sample_obs, sample_acs, sample_log_probs)
 
         return reward_log
 
+    def build_background_tensors(self, demo_batch, sample_batch) -> List[tuple]:
+        """
+        Convert demo + sample paths straight into per-path
+        (observation, action, log_prob) device tensor tuples, the format
+        train_reward/MLPReward.update accept. Replaces the
+        add -> sample_all -> flush round trip through background_buffer,
+        which reconcatenated every component array on each call
+        """
+        return [
+            (torch.as_tensor(path["observation"], dtype=torch.float32, device=ptu.device),
+             torch.as_tensor(path["action"], dtype=torch.float32, device=ptu.device),
+             torch.as_tensor(path["log_prob"], dtype=torch.float32, device=ptu.device))
+            for path in chain(demo_batch, sample_batch)
+        ]
+
     ##################################################################################################
 
     def train_policy(self,
@@ -21,6 +21,63 @@ ALGO = {
         "her": HER,
     }
 
+# Per-algo constructor defaults, overridable through agent_params.
+# One table + one construction path instead of a ~15-line branch per algo
+DEFAULTS = {
+    "ppo": dict(
+        n_steps=2048,
+        batch_size=64,
+        n_epochs=10,
+        gamma=0.99,
+        gae_lambda=0.95,
+        clip_range=0.2,
+        clip_range_vf=None,
+        vf_coef=0.5,
+        max_grad_norm=0.5,
+    ),
+    "a2c": dict(
+        n_steps=2000,  # Nav: 3e-4, 2000
+        gamma=0.99,
+        gae_lambda=1.0,
+        normalize_advantage=False,
+    ),
+    "sac": dict(
+        buffer_size=300_000,  # buff 300_000
+        learning_starts=500,
+        batch_size=256,  # default 256
+        tau=0.005,
+        gamma=0.99,
+        # Update the model every ``train_freq`` steps.
+        train_freq=10,
+        # How many gradient steps to do after each rollout
+        gradient_steps=-1,
+        action_noise=None,
+        optimize_memory_usage=False,
+        # update the target network every ``target_network_update_freq`` gradient steps.
+        target_update_interval=2,
+        use_sde=False,
+        use_sde_at_warmup=True,
+    ),
+    "her": dict(
+        n_sampled_goal=4,
+        goal_selection_strategy='future',  # One of ['episode', 'final', 'future', 'random']
+        buffer_size=1_000_000,
+        online_sampling=True,  # Sample HER transitions online
+        max_episode_length=None,
+        # SAC
+        ent_coef='auto',
+        batch_size=2000,
+        gamma=0.99,
+        learning_starts=0,
+    ),
+}
+
+# default learning rate per algo (agent_params key: 'policy_lr')
+DEFAULT_LR = {"ppo": 3e-4, "a2c": 3e-4, "sac": 1e-3, "her": 1e-3}
+
+# default: PPO=1, A2C=100, SAC=4, HER=4
+LOG_INTERVAL = {"ppo": 2, "a2c": 2, "sac": 10, "her": 20}
+
 
 class GCL_AgentSB3(BaseAgent, metaclass=ABCMeta):
     """ GCL Agent migrate with SB3"""
@@ -49,118 +106,34 @@ class GCL_AgentSB3(BaseAgent, metaclass=ABCMeta):
 
 
         # actor/policy
-        if agent_params["model_class"] == 'ppo':
-            self.actor = self.model_class(
-                # key
-                policy="MlpPolicy",
-                env=self.env,
-                learning_rate=self.agent_params.get('policy_lr', 3e-4),
-                n_steps=self.agent_params.get('n_steps', 2048),
-                batch_size=self.agent_params.get('batch_size', 64),     # 64
-                n_epochs=self.agent_params.get('n_epochs', 10),
-                gamma=self.agent_params.get('gamma', 0.99),
-                gae_lambda=self.agent_params.get('gae_lambda', 0.95),
-                clip_range=self.agent_params.get('clip_range', 0.2),
-                clip_range_vf=self.agent_params.get('clip_range_vf', None),
-                vf_coef=0.5,
-                max_grad_norm=0.5,
-
-                # utils
-                tensorboard_log=self.agent_params.get('tensorboard_log', None),
-                # (Only available when passing string for the environment)
-                create_eval_env=self.agent_params.get('create_eval_env', False),
-                policy_kwargs=self.agent_params.get('policy_kwargs', None),
-                verbose=self.agent_params.get('verbose', 1),
-                seed=self.agent_params.get('seed', 42),
-                device=ptu.device  # "auto"
-            )
-            self.log_interval = 2
-
-        elif agent_params["model_class"] == 'a2c':
-            self.actor = self.model_class(
-                # key
-                policy="MlpPolicy",
-                env=self.env,
-                learning_rate=self.agent_params.get('policy_lr', 3e-4),  # Nav: 3e-4, 2000
-                n_steps=self.agent_params.get('n_steps', 2000),  # -- diff
-                gamma=self.agent_params.get('gamma', 0.99),
-                gae_lambda=self.agent_params.get('gae_lambda', 1.0),
-                normalize_advantage=self.agent_params.get('normalize_advantage', False),
-
-                # utils
-                tensorboard_log=self.agent_params.get('tensorboard_log', None),
-                create_eval_env=self.agent_params.get('create_eval_env', False),
-                policy_kwargs=self.agent_params.get('policy_kwargs', None),
-                verbose=self.agent_params.get('verbose', 1),
-                seed=self.agent_params.get('seed', 42),
-                device=ptu.device  # "auto"
-            )
-            self.log_interval = 2
-
-        elif agent_params["model_class"] == 'sac':
-            self.actor = self.model_class(
-                # key
-                policy="MlpPolicy",
-                env=self.env,
-                learning_rate=self.agent_params.get('policy_lr', 1e-3),  # Nav: 1e-3
-                buffer_size=self.agent_params.get('buffer_size', 300_000),  # buff 300_000
-                learning_starts=500,
-                batch_size=self.agent_params.get('batch_size', 256),  # default 256,
-                tau=self.agent_params.get('tau', 0.005),
-                gamma=self.agent_params.get('gae_lambda', 0.99),
-                # train_freq=self.agent_params.get('train_freq', 1),  # SEE DOC
-                # Update the model every ``train_freq`` steps.
-                train_freq=10,
-                # How many gradient steps to do after each rollout
-                gradient_steps=self.agent_params.get('gradient_steps', -1),
-                action_noise=self.agent_params.get('action_noise', None),
-                optimize_memory_usage=self.agent_params.get('optimize_memory_usage', False),
-                # update the target network every ``target_network_update_freq``gradient steps.
-                target_update_interval=self.agent_params.get('target_update_interval', 2),
-                use_sde=False,
-                use_sde_at_warmup=True,
-
-                # utils
-                tensorboard_log=self.agent_params.get('tensorboard_log', None),
-                create_eval_env=self.agent_params.get('create_eval_env', False),
-                policy_kwargs=self.agent_params.get('policy_kwargs', None),
-                verbose=self.agent_params.get('verbose', 1),  # verbosity level: 0 no output, 1 info, 2 debug
-                seed=self.agent_params.get('seed', 42),
-                device=ptu.device  # "auto"
-            )
-            self.log_interval = 10
-
-        elif agent_params["model_class"] == 'her':
+        algo_name = agent_params["model_class"]
+        if algo_name not in DEFAULTS:
+            raise NotImplementedError("Please Provide Valid Policy")
+
+        if algo_name == 'her':
             print(f"HER requires the environment to inherits from gym.GoalEnv")
-            self.actor = self.model_class(
-                policy='MlpPolicy',
-                env=self.env,
-                model_class=SAC,
-                # HER
-                n_sampled_goal=4,
-                goal_selection_strategy='future',  # One of [‘episode’, ‘final’, ‘future’, ‘random’]
-                buffer_size=1_000_000,
-                # online_sampling=True,  # Sample HER transitions online
-                online_sampling=True,  # Sample HER transitions online
-                max_episode_length=None,
-                # SAC
-                ent_coef='auto',
-                batch_size=2000,
-                gamma=0.99,
-                learning_rate=self.agent_params.get('policy_lr', 1e-3),
-                learning_starts=0,
-
-                # utils
-                tensorboard_log=self.agent_params.get('tensorboard_log', None),
-                verbose=self.agent_params.get('verbose', 1),
-                seed=self.agent_params.get('seed', 42),
-                device=ptu.device
-
-            )
-            self.log_interval = 20
 
+        # single construction path: table defaults overridden by agent_params
+        algo_kwargs = {k: self.agent_params.get(k, v) for k, v in DEFAULTS[algo_name].items()}
+        algo_kwargs['learning_rate'] = self.agent_params.get('policy_lr', DEFAULT_LR[algo_name])
+        algo_kwargs['tensorboard_log'] = self.agent_params.get('tensorboard_log', None)
+        algo_kwargs['verbose'] = self.agent_params.get('verbose', 1)  # verbosity level: 0 no output, 1 info, 2 debug
+        algo_kwargs['seed'] = self.agent_params.get('seed', 42)
+        if algo_name == 'her':
+            # wrapped off-policy algo, not overridable through agent_params
+            algo_kwargs['model_class'] = SAC
         else:
-            raise NotImplementedError("Please Provide Valid Policy")
+            # (Only available when passing string for the environment)
+            algo_kwargs['create_eval_env'] = self.agent_params.get('create_eval_env', False)
+            algo_kwargs['policy_kwargs'] = self.agent_params.get('policy_kwargs', None)
+
+        self.actor = self.model_class(
+            policy="MlpPolicy",
+            env=self.env,
+            device=ptu.device,  # "auto"
+            **algo_kwargs
+        )
+        self.log_interval = LOG_INTERVAL[algo_name]
 
         # Replay buffers: demo holds expert demonstrations and sample holds policy samples
         self.demo_buffer = ReplayBuffer(1_000_000)
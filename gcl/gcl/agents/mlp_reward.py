@@ -130,10 +130,15 @@ class MLPReward(nn.Module):
         assert len(sample_obs) == len(sample_acs) == len(sample_log_probs), "Length of Sample trajs do not match"
 
         # Demo Return
+        # inputs may already be device tensors
+        # (GCL_Agent.build_background_tensors); only numpy arrays pay the
+        # conversion
         demo_rollouts_return = []
         for demo_ob, demo_ac in zip(demo_obs, demo_acs):
-            demo_ob, demo_ac = np.array(demo_ob, dtype=np.float32), np.array(demo_ac, dtype=np.float32)
-            demo_rew = self(ptu.from_numpy(demo_ob), ptu.from_numpy(demo_ac))
+            if not isinstance(demo_ob, torch.Tensor):
+                demo_ob = ptu.from_numpy(np.asarray(demo_ob, dtype=np.float32))
+                demo_ac = ptu.from_numpy(np.asarray(demo_ac, dtype=np.float32))
+            demo_rew = self(demo_ob, demo_ac)
             # Append total reward along that trajectory
             demo_rollouts_return.append(demo_rew.sum(-1))
 
@@ -142,13 +147,16 @@ class MLPReward(nn.Module):
         sample_rollouts_logprob = []
         for sample_ob, sample_ac, sample_log_prob in zip(sample_obs, sample_acs, sample_log_probs):
             # Sample returns
-            sample_ob, sample_ac = np.array(sample_ob, dtype=np.float32), np.array(sample_ac, dtype=np.float32)
-            sample_rew = self(ptu.from_numpy(sample_ob), ptu.from_numpy(sample_ac))
+            if not isinstance(sample_ob, torch.Tensor):
+                sample_ob = ptu.from_numpy(np.asarray(sample_ob, dtype=np.float32))
+                sample_ac = ptu.from_numpy(np.asarray(sample_ac, dtype=np.float32))
+            sample_rew = self(sample_ob, sample_ac)
             sample_rollouts_return.append(sample_rew.sum(-1))
             # Sample log_probs
-            assert isinstance(sample_log_prob, np.ndarray)
-            sample_log_prob = torch.squeeze(ptu.from_numpy(sample_log_prob), dim=-1)
-            sum_log_prob = sample_log_prob.sum(-1)
+            if not isinstance(sample_log_prob, torch.Tensor):
+                assert isinstance(sample_log_prob, np.ndarray)
+                sample_log_prob = ptu.from_numpy(sample_log_prob)
+            sum_log_prob = torch.squeeze(sample_log_prob, dim=-1).sum(-1)
             sample_rollouts_logprob.append(sum_log_prob)
 
         demo_return = torch.stack(demo_rollouts_return)
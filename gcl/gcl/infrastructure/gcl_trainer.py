@@ -1,6 +1,5 @@
 import pickle
 import time
-from functools import lru_cache
 from collections import OrderedDict
 import itertools
 import copy
@@ -23,6 +22,7 @@ import gcl.infrastructure.pytorch_util as ptu
 from gcl.infrastructure.logger import Logger
 import gcl.infrastructure.utils as utils
 from gcl.infrastructure.utils import PathDict
+from gcl.infrastructure.wrapper import PathEnd
 from gcl.policies.base_policy import BasePolicy
 
 
@@ -46,6 +46,9 @@ class GCL_Trainer(object):
 
         # Set random seeds
         seed = self.params['seed']
+        # per-trainer PCG64 generator for buffer sampling; the legacy global
+        # seed stays for third-party code (gym, sb3) that still reads it
+        self.rng: np.random.Generator = np.random.default_rng(seed)
         np.random.seed(seed)
         torch.manual_seed(seed)
         torch.cuda.manual_seed(seed)
@@ -73,6 +76,13 @@ class GCL_Trainer(object):
             self.env.reward_type = 'dense'
             self.env = FlattenObservation(FilterObservation(self.env, ['observation', 'desired_goal']))
 
+        # Optional vectorized sampling: num_envs > 1 steps N copies of the env
+        # in lock-step so policy and reward forwards run batched per step.
+        # Construction is deferred until ep_len is known (below), since the
+        # PathEnd sub-env wrapper needs the step cap
+        self.num_envs: int = params.get('num_envs', 1)
+        self.vec_env = None
+
 
         # Maximum length for episodes
         try:
@@ -85,6 +95,34 @@ class GCL_Trainer(object):
         global MAX_VIDEO_LEN
         MAX_VIDEO_LEN = self.params['ep_len']
 
+        # bind hot-loop params once: the training loops hit these every
+        # iteration (or every inner step), so skip the repeated dict lookups
+        self._ep_len: int = self.params['ep_len']
+        self._train_batch_size: Optional[int] = self.params.get('train_batch_size')
+        self._train_demo_batch_size: Optional[int] = self.params.get('train_demo_batch_size')
+        self._train_sample_batch_size: Optional[int] = self.params.get('train_sample_batch_size')
+        self._num_reward_train_steps_per_iter: Optional[int] = self.params.get('num_reward_train_steps_per_iter')
+        self._num_policy_train_steps_per_iter: Optional[int] = self.params.get('num_policy_train_steps_per_iter')
+        self._eval_batch_size: Optional[int] = self.params.get('eval_batch_size')
+
+        if self.num_envs > 1 and not self.env_wrapper:
+            env_name = self.params['env_name']
+            ep_len = self._ep_len
+            # PathEnd records info['terminal_observation'] and forces done
+            # on the step cap / is_success: gym 0.18's vector envs
+            # auto-reset without exposing the terminal observation, and the
+            # sampler relies on every path end being a real reset
+            env_fns = [lambda: PathEnd(gym.make(env_name), ep_len) for _ in range(self.num_envs)]
+            if params.get('async_envs', False):
+                # subprocess workers step in parallel; shared_memory avoids
+                # pickling observations back and copy=False skips the read copy
+                self.vec_env = gym.vector.AsyncVectorEnv(env_fns, shared_memory=True, copy=False)
+            else:
+                self.vec_env = gym.vector.SyncVectorEnv(env_fns)
+            # seed once at construction with a distinct stream per sub-env;
+            # episodes rely on auto-reset, never on re-seeding
+            self.vec_env.seed([seed + i for i in range(self.num_envs)])
+
         ########################################
         ########################################
 
@@ -156,6 +194,21 @@ class GCL_Trainer(object):
         self.agent = agent_class(self.env, self.params['agent_params'])
         self.test_agent = None
 
+        # share the trainer's generator with the agent's buffers so all
+        # random sampling flows from the same seed
+        for buffer in (self.agent.demo_buffer, self.agent.sample_buffer,
+                       self.agent.background_buffer, self.agent.test_buffer):
+            buffer.rng = self.rng
+
+        # Optionally JIT-fuse the hot MLP forwards (torch >= 2.0 only).
+        # The sb3 actor is left alone: sb3 manages its own policy nets
+        if self.params.get('compile', False) and hasattr(torch, 'compile'):
+            self.agent.reward.mlp = torch.compile(self.agent.reward.mlp)
+            if getattr(self.agent.actor, 'mean_net', None) is not None:
+                self.agent.actor.mean_net = torch.compile(self.agent.actor.mean_net)
+            if getattr(self.agent.actor, 'baseline', None) is not None:
+                self.agent.actor.baseline = torch.compile(self.agent.actor.baseline)
+
     ##################################
 
     def __repr__(self) -> str:
@@ -195,7 +248,7 @@ class GCL_Trainer(object):
 
         #####################################################################
         # 1. Add demonstrations to replay buffer
-        with torch.no_grad():
+        with torch.inference_mode():
             demo_paths, _, _ = self.collect_demo_trajectories(expert_data, expert_policy,
                                                               ntrajs=self.params['demo_size'],
                                                               render=False,
@@ -207,9 +260,12 @@ class GCL_Trainer(object):
 
         #####################################################################
         # 2.
-        n_iter_loop = tqdm(range(n_iter), desc="Guided Cost Learning", leave=False)
+        verbose = self.params.get('verbose', True)
+        n_iter_loop = tqdm(range(n_iter), desc="Guided Cost Learning", leave=False,
+                           disable=not self.params.get('progress', True))
         for itr in n_iter_loop:
-            print(f"\n********** Iteration {itr} ************")
+            if verbose:
+                print(f"\n********** Iteration {itr} ************")
             self.itr = itr
             # set mode to train
             self.agent.actor.train()
@@ -233,10 +289,10 @@ class GCL_Trainer(object):
             # collect trajectories, to be used for training
             # On-policy PG need to collect new trajectories at *every* iteration
             samp_start_time = time.time()
-            with torch.no_grad():
+            with torch.inference_mode():
                 training_returns = self.collect_training_trajectories(
                     collect_policy=collect_policy,
-                    batch_size=self.params["train_batch_size"]
+                    batch_size=self._train_batch_size
                 )
             # utils.toc(samp_start_time, "collect training trajs")
             samp_paths, envsteps_this_batch, train_video_paths = training_returns
@@ -247,16 +303,17 @@ class GCL_Trainer(object):
             # 4. Append samples D_traj to D_samp
             self.agent.add_to_buffer(samp_paths)
             # show status
-            self.buffer_status(demo=True, samp=True)
+            if verbose:
+                self.buffer_status(demo=True, samp=True)
 
             # # testing
             # if itr == 240:
             #     self.test_agent = copy.deepcopy(self.agent)
             #     for idx in tqdm(range(200)):
-            #         with torch.no_grad():
+            #         with torch.inference_mode():
             #             test_returns = self.collect_training_trajectories(
             #                 collect_policy=self.test_agent.actor,
-            #                 batch_size=self.params["train_batch_size"]
+            #                 batch_size=self._train_batch_size
             #             )
             #         test_paths, envsteps_this_batch, _ = test_returns
             #         self.test_agent.test_buffer.add_rollouts(test_paths)
@@ -282,6 +339,7 @@ class GCL_Trainer(object):
             self.show_logs(itr, self.total_envsteps,
                            samp_paths,
                            reward_logs, policy_logs,
+                           verbose=verbose,
                            logging=True
                            )
 
@@ -311,15 +369,12 @@ class GCL_Trainer(object):
                 fname2 = f"../model/test_gcl_policy_{itr}.pth"
                 policy_model = self.agent.actor
                 torch.save(policy_model, fname2)
-            # update progress bar
-            n_iter_loop.set_postfix()
 
         # Close writer at the end of training,
         self.logger.close()
         return train_log_lst, policy_log_lst
 
     ############################################################################################
-    @lru_cache(maxsize=10)
     def collect_demo_trajectories(self,
                                   expert_data: Optional[str] = None, expert_policy: Optional[str] = None,
                                   ntrajs: int = 100, demo_batch_size: int = 1000,
@@ -344,9 +399,13 @@ class GCL_Trainer(object):
         # Load expert policy or expert demonstrations D_demo
         if expert_data:
             print('\nLoading saved demonstrations...')
-            with open(expert_data, 'rb') as f:
-                # TODO: load data may not through pickle
-                demo_paths = pickle.load(f)
+            if expert_data.endswith('.npz'):
+                # structure-of-arrays format (see utils.convert_demos_to_npz)
+                demo_paths = utils.load_demos_npz(expert_data)
+            else:
+                with open(expert_data, 'rb') as f:
+                    # TODO: load data may not through pickle
+                    demo_paths = pickle.load(f)
             # TODO: sample self.params['demo_size'] from demo_paths
             return demo_paths[: ntrajs], 0, None
 
@@ -355,16 +414,29 @@ class GCL_Trainer(object):
             # expert_policy_model = HER.load(expert_policy, env=self.env)
             print('\nRunning expert policy to collect demonstrations...')
 
-            demo_paths = utils.sample_n_trajectories(
-                self.env,
-                policy=expert_policy_model,
-                agent=self.agent,
-                ntrajs=self.params['demo_size'],
-                max_path_length=self.params['ep_len'],
-                render=render,
-                render_mode=render_mode,
-                expert=True
-            )
+            if self.vec_env is not None and not render:
+                # batched expert predict across sub-envs; rendering still
+                # needs the single-env path
+                demo_paths = utils.sample_n_trajectories_vec(
+                    self.vec_env,
+                    policy=expert_policy_model,
+                    agent=self.agent,
+                    ntrajs=self.params['demo_size'],
+                    max_path_length=self._ep_len,
+                    expert=True,
+                    deterministic=True,
+                )
+            else:
+                demo_paths = utils.sample_n_trajectories(
+                    self.env,
+                    policy=expert_policy_model,
+                    agent=self.agent,
+                    ntrajs=self.params['demo_size'],
+                    max_path_length=self._ep_len,
+                    render=render,
+                    render_mode=render_mode,
+                    expert=True
+                )
 
             if verbose:
                 # utils.evaluate_model(self.params['env_name'], expert_policy_model, num_episodes=100)
@@ -393,18 +465,29 @@ class GCL_Trainer(object):
         train_video_paths: Optional[List[PathDict]] = None
 
         print("\nCollecting sample trajectories to be used for training...")
-        with torch.no_grad():
-            paths, envsteps_this_batch = utils.sample_trajectories(
-                env=self.env,
-                policy=collect_policy,
-                agent=self.agent,
-                min_timesteps_per_batch=batch_size,
-                max_path_length=self.params['ep_len'],
-                device=ptu.device,
-                deterministic=False,
-                sb3=False,
+        with torch.inference_mode():
+            if self.vec_env is not None:
+                paths, envsteps_this_batch = utils.sample_trajectories_vec(
+                    venv=self.vec_env,
+                    policy=collect_policy,
+                    agent=self.agent,
+                    min_timesteps_per_batch=batch_size,
+                    max_path_length=self._ep_len,
+                    device=ptu.device,
+                    deterministic=False,
+                )
+            else:
+                paths, envsteps_this_batch = utils.sample_trajectories(
+                    env=self.env,
+                    policy=collect_policy,
+                    agent=self.agent,
+                    min_timesteps_per_batch=batch_size,
+                    max_path_length=self._ep_len,
+                    device=ptu.device,
+                    deterministic=False,
+                    sb3=False,
 
-            )
+                )
 
         return paths, envsteps_this_batch, train_video_paths
 
@@ -419,40 +502,45 @@ class GCL_Trainer(object):
             print('\n Sampling recent rollouts from sample Replay buffer')
 
         reward_logs = []
-        # 1.
-        K_train_reward_loop = range(self.params['num_reward_train_steps_per_iter'])
-        for k_rew in K_train_reward_loop:
-            # 2. Sample demonstration batch D^_{demo} \subset D_{demo}
-            demo_batch = self.agent.sample_rollouts(self.params['train_demo_batch_size'], demo=True)
-            # 3. Sample background batch D^_{samp} \subset D_{sample}
-            if not recent:
-                # random sampling
-                sample_batch = self.agent.sample_rollouts(self.params['train_sample_batch_size'])
-            else:
-                # sample recent data
-                sample_batch = self.agent.sample_recent_rollouts(self.params['train_sample_batch_size'])
-
-            # reshape rollouts' elements to match the dimension in Replay buffer
-            for num_rollout, _ in enumerate(demo_batch):
-                demo_batch[num_rollout]["log_prob"] = demo_batch[num_rollout]["log_prob"].reshape(-1, 1)
-                demo_batch[num_rollout]["reward"] = demo_batch[num_rollout]["reward"].reshape(-1, 1)
 
-            # 4. Append \hat{D}_demo and \hat{D}_samp to background
-            self.agent.add_to_buffer(demo_batch, background=True)
-            self.agent.add_to_buffer(sample_batch, background=True)
+        # Resampling a fresh background distribution at every inner step is
+        # the default; with resample_background_each_step=False the batches
+        # are drawn once per iteration and reused across all K gradient steps
+        resample = self.params.get('resample_background_each_step', True)
+        demo_batch = background_batch = None
+        if not resample:
+            demo_batch, background_batch = self._sample_background(recent)
 
-            # use all samples from background batch
-            background_batch = self.agent.sample_background_rollouts(all_rollouts=True)
+        # 1.
+        K_train_reward_loop = range(self._num_reward_train_steps_per_iter)
+        for k_rew in K_train_reward_loop:
+            if resample:
+                demo_batch, background_batch = self._sample_background(recent)
 
             # 5&6. Estimate gradient loss and update parameters
             reward_log = self.agent.train_reward(demo_batch, background_batch)
             reward_logs.append(reward_log)
 
-            # clear background batch
-            self.agent.background_buffer.flush()
-
         return reward_logs
 
+    def _sample_background(self, recent: bool) -> Tuple[np.ndarray, List[tuple]]:
+        """ Draw demo and sample batches and build the background distribution """
+        # 2. Sample demonstration batch D^_{demo} \subset D_{demo}
+        demo_batch = self.agent.sample_rollouts(self._train_demo_batch_size, demo=True)
+        # 3. Sample background batch D^_{samp} \subset D_{sample}
+        if not recent:
+            # random sampling
+            sample_batch = self.agent.sample_rollouts(self._train_sample_batch_size)
+        else:
+            # sample recent data
+            sample_batch = self.agent.sample_recent_rollouts(self._train_sample_batch_size)
+
+        # 4. Build background \hat{D}_demo + \hat{D}_samp directly as device
+        # tensors, skipping the background_buffer add/sample_all/flush cycle
+        # (rollout elements are already shaped (T, 1) by ReplayBuffer)
+        background_batch = self.agent.build_background_tensors(demo_batch, sample_batch)
+        return demo_batch, background_batch
+
     ############################################################################################
     def train_policy(self) -> List[Sequence[Dict[str, np.ndarray]]]:
         """
@@ -461,10 +549,10 @@ class GCL_Trainer(object):
         print('\nTraining agent using sampled data from replay buffer...')
         train_policy_logs = []
 
-        K_train_policy_loop = range(self.params['num_policy_train_steps_per_iter'])
+        K_train_policy_loop = range(self._num_policy_train_steps_per_iter)
         for k in K_train_policy_loop:
             ob_batch, ac_batch, re_batch, next_ob_batch, terminal_batch = self.agent.sample(
-                self.params['train_batch_size'],
+                self._train_batch_size,
                 demo=False
             )
             policy_loss: dict = self.agent.train_policy(ob_batch, ac_batch, re_batch,
@@ -498,11 +586,11 @@ class GCL_Trainer(object):
 
         # collect eval trajectories, for logging
         print("\nCollecting data for eval...")
-        # with torch.no_grad():
+        # with torch.inference_mode():
         eval_returns = utils.sample_trajectories(self.env,
                                                  eval_policy, self.agent,
-                                                 min_timesteps_per_batch=self.params['eval_batch_size'],
-                                                 max_path_length=self.params['ep_len'],
+                                                 min_timesteps_per_batch=self._eval_batch_size,
+                                                 max_path_length=self._ep_len,
                                                  evaluate=True,
                                                  )
         eval_paths, eval_envsteps_this_batch = eval_returns
@@ -510,7 +598,7 @@ class GCL_Trainer(object):
         # save eval rollouts as videos in tensorboard event file
         if self.log_video and train_video_paths is not None:
             print('\nCollecting video rollouts eval')
-            # with torch.no_grad():
+            # with torch.inference_mode():
             eval_video_paths = utils.sample_n_trajectories(self.env, eval_policy, self.agent,
                                                            ntrajs=MAX_NVIDEO,
                                                            max_path_length=MAX_VIDEO_LEN,
@@ -526,13 +614,18 @@ class GCL_Trainer(object):
 
         # save eval metrics
         if self.log_metrics:
-            # returns, for logging
-            train_returns = [path["reward"].sum() for path in train_paths]
-            eval_returns = [eval_path["reward"].sum() for eval_path in eval_paths]
+            # returns, for logging (np.fromiter fills the array directly,
+            # skipping the intermediate Python list)
+            train_returns = np.fromiter((path["reward"].sum() for path in train_paths),
+                                        dtype=np.float64, count=len(train_paths))
+            eval_returns = np.fromiter((eval_path["reward"].sum() for eval_path in eval_paths),
+                                       dtype=np.float64, count=len(eval_paths))
 
             # episode lengths, for logging
-            train_ep_lens = [len(path["reward"]) for path in train_paths]
-            eval_ep_lens = [len(eval_path["reward"]) for eval_path in eval_paths]
+            train_ep_lens = np.fromiter((len(path["reward"]) for path in train_paths),
+                                        dtype=np.int64, count=len(train_paths))
+            eval_ep_lens = np.fromiter((len(eval_path["reward"]) for eval_path in eval_paths),
+                                       dtype=np.int64, count=len(eval_paths))
 
             # decide what to log
             '''Here eval are viewing True Reward, train viewing MLP Reward'''
@@ -619,8 +712,10 @@ class GCL_Trainer(object):
         last_reward_log = reward_logs[-1]
 
         # episode lengths, for logging
-        train_returns = [path["reward"].sum() for path in train_paths]
-        train_ep_lens = [len(path["reward"]) for path in train_paths]
+        train_returns = np.fromiter((path["reward"].sum() for path in train_paths),
+                                    dtype=np.float64, count=len(train_paths))
+        train_ep_lens = np.fromiter((len(path["reward"]) for path in train_paths),
+                                    dtype=np.int64, count=len(train_paths))
 
         training_logs = OrderedDict()
         training_logs["Train_AverageReturn"] = np.mean(train_returns)
@@ -632,7 +727,8 @@ class GCL_Trainer(object):
         training_logs.update(last_policy_log)
         training_logs.update(last_reward_log)
         '''training_logs'''
-        print("|----------------------------|")
+        if verbose:
+            print("|----------------------------|")
         for key, value in training_logs.items():
             if verbose:
                 if isinstance(value, str):
@@ -642,17 +738,18 @@ class GCL_Trainer(object):
             if logging:
                 pass
                 # self.logger.log_scalar(value, key, itr)
-        print("---------------------------------------------------")
+        if verbose:
+            print("---------------------------------------------------")
         # self.logger.flush()
 
     def perform_pg2opt(self):
         print('\nTraining agent using sampled data from replay buffer...')
         train_policy_logs = []
 
-        K_test_policy_loop = range(self.params['num_policy_train_steps_per_iter'])
+        K_test_policy_loop = range(self._num_policy_train_steps_per_iter)
         for k in K_test_policy_loop:
             ob_batch, ac_batch, re_batch, next_ob_batch, terminal_batch = self.test_agent.test_buffer. \
-                sample_recent_data(self.params['train_batch_size'], concat_rew=False)
+                sample_recent_data(self._train_batch_size, concat_rew=False)
 
             policy_loss: dict = self.test_agent.train_policy(ob_batch, ac_batch, re_batch,
                                                              next_ob_batch, terminal_batch)
@@ -82,7 +82,21 @@ def set_device(device: Union[torch.device, int]) -> None:
 
 def from_numpy(*args, **kwargs):
     """ Convert numpy array to torch tensor  and send to device('cuda:0' or 'cpu') """
-    return torch.from_numpy(*args, **kwargs).float().to(device)
+    tensor = torch.from_numpy(*args, **kwargs).float()
+    if device is not None and device.type == 'cuda':
+        # pin first so the H2D copy is DMA-driven and can overlap compute
+        return tensor.pin_memory().to(device, non_blocking=True)
+    return tensor.to(device)
+
+
+def as_tensor(x: Union[np.ndarray, torch.Tensor]) -> torch.Tensor:
+    """
+    Like from_numpy, but a passthrough for inputs that are already torch
+    tensors (avoids a redundant host->device copy when data lives on device)
+    """
+    if isinstance(x, torch.Tensor):
+        return x.to(device)
+    return from_numpy(x)
 
 
 def to_numpy(tensor: Optional[torch.FloatTensor]) -> Optional[np.ndarray]:
@@ -1,4 +1,6 @@
-from typing import List, Tuple, Union
+import threading
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -6,11 +8,55 @@ import gcl.infrastructure.utils as utils
 from gcl.infrastructure.utils import PathDict
 
 
+class _ReadWriteLock:
+    """
+    Reader-writer lock: many concurrent readers OR one exclusive writer.
+    Sampling only reads the buffer, so concurrent samplers need not serialize
+    against each other; only add_rollouts/flush take the exclusive lock
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def gen_rlock(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def gen_wlock(self):
+        with self._cond:
+            while self._writer or self._readers > 0:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
 class ReplayBuffer(object):
     """ Buffer to store environment transitions """
-    def __init__(self, max_size=1_000_000):
+    def __init__(self, max_size=1_000_000, rng: Optional[np.random.Generator] = None):
         assert isinstance(max_size, int)
         self._max_size: int = max_size
+        self._lock = _ReadWriteLock()
+
+        # PCG64 generator for random sampling; avoids the lock and
+        # per-call dispatch of the legacy global np.random state
+        self._rng: np.random.Generator = rng if rng is not None else np.random.default_rng()
 
         # store each rollout
         self._paths: List[PathDict] = []
@@ -34,6 +80,15 @@ class ReplayBuffer(object):
     def max_size(self) -> int:
         return self._max_size
 
+    @property
+    def rng(self) -> np.random.Generator:
+        return self._rng
+
+    @rng.setter
+    def rng(self, value):
+        assert isinstance(value, np.random.Generator)
+        self._rng = value
+
     @property
     def paths(self) -> List[PathDict]:
         return self._paths
@@ -161,6 +216,18 @@ class ReplayBuffer(object):
     def add_rollouts(self, paths: List[PathDict]) -> None:
         """ Add new rollouts into our list of rollouts """
         assert len(paths) > 0, "Adding empty rollout"
+        with self._lock.gen_wlock():
+            self._add_rollouts(paths)
+
+    def _add_rollouts(self, paths: List[PathDict]) -> None:
+        # normalize per-path shapes to (T, 1) once at insertion, so samplers
+        # and trainers never have to reshape (expert paths carry 1-D rewards
+        # and log_probs, learned-reward paths carry (T, 1))
+        for path in paths:
+            if path["log_prob"].ndim == 1:
+                path["log_prob"] = path["log_prob"].reshape(-1, 1)
+            if path["reward"].ndim == 1:
+                path["reward"] = path["reward"].reshape(-1, 1)
 
         self.new_path_len = len(paths)
         self.new_data_len = int(np.sum([path['observation'].shape[0] for path in paths]))
@@ -216,10 +283,11 @@ class ReplayBuffer(object):
         :type: np.array(List[PathDict])
         """
         assert isinstance(num_rollouts, int)
-        assert len(self.paths) != 0, "No rollouts in Buffer"
-        assert len(self.paths) >= num_rollouts, "Rollouts in Buffer is less than rollouts acquired "
-        rand_indices = np.random.permutation(len(self.paths))[:num_rollouts]
-        return np.array(self.paths)[rand_indices]
+        with self._lock.gen_rlock():
+            assert len(self.paths) != 0, "No rollouts in Buffer"
+            assert len(self.paths) >= num_rollouts, "Rollouts in Buffer is less than rollouts acquired "
+            rand_indices = self._rng.permutation(len(self.paths))[:num_rollouts]
+            return np.array(self.paths)[rand_indices]
 
     def sample_recent_rollouts(self, num_rollouts: int = 1) -> np.ndarray:
         """
@@ -230,9 +298,10 @@ class ReplayBuffer(object):
         :type: List[PathDict]
         """
         assert isinstance(num_rollouts, int)
-        assert len(self.paths) != 0, "No rollouts in Buffer"
-        assert len(self.paths) >= num_rollouts, "Rollouts in Buffer is less than rollouts acquired "
-        return np.array(self.paths)[-num_rollouts:]
+        with self._lock.gen_rlock():
+            assert len(self.paths) != 0, "No rollouts in Buffer"
+            assert len(self.paths) >= num_rollouts, "Rollouts in Buffer is less than rollouts acquired "
+            return np.array(self.paths)[-num_rollouts:]
 
     def sample_all_rollouts(self) -> np.ndarray:
         """
@@ -240,8 +309,9 @@ class ReplayBuffer(object):
         :return: random rollouts
         :type: np.array(List[PathDict])
         """
-        assert len(self.paths) != 0, "No rollouts in Buffer"
-        return np.array(self.paths)
+        with self._lock.gen_rlock():
+            assert len(self.paths) != 0, "No rollouts in Buffer"
+            return np.array(self.paths)
 
     ########################################
     ########################################
@@ -251,15 +321,16 @@ class ReplayBuffer(object):
         Sample random transition steps of size batch_size
         """
         assert isinstance(batch_size, int)
-        assert len(self.paths) != 0, "No path in Buffer"
-        assert 0 <= batch_size <= self._obs.shape[0], "No enough transition steps in buffer"
-        assert (self._obs.shape[0] == self._acs.shape[0]
-                == self._concatenated_rews.shape[0]
-                == self._next_obs.shape[0] == self._terminals.shape[0]), "num of data do not match"
+        with self._lock.gen_rlock():
+            assert len(self.paths) != 0, "No path in Buffer"
+            assert 0 <= batch_size <= self._obs.shape[0], "No enough transition steps in buffer"
+            assert (self._obs.shape[0] == self._acs.shape[0]
+                    == self._concatenated_rews.shape[0]
+                    == self._next_obs.shape[0] == self._terminals.shape[0]), "num of data do not match"
 
-        rand_indices = np.random.permutation(self._obs.shape[0])[:batch_size]
-        return (self._obs[rand_indices], self._acs[rand_indices], self._concatenated_rews[rand_indices],
-                self._next_obs[rand_indices], self._terminals[rand_indices])
+            rand_indices = self._rng.permutation(self._obs.shape[0])[:batch_size]
+            return (self._obs[rand_indices], self._acs[rand_indices], self._concatenated_rews[rand_indices],
+                    self._next_obs[rand_indices], self._terminals[rand_indices])
 
     def sample_recent_data(self,
                            batch_size: int = 1,
@@ -272,30 +343,35 @@ class ReplayBuffer(object):
         :return: observations, actions, unconcatenated_rews, next_observations, terminals
         """
         assert isinstance(batch_size, int) and batch_size >= 0
-        assert len(self.paths) != 0, "No recent Data in Buffer"
-        assert self._num_data >= batch_size, "Data in Buffer is less than data acquired "
-        if concat_rew:
-            return (self._obs[-batch_size:], self._acs[-batch_size:],
-                    self._concatenated_rews[-batch_size:], self._next_obs[-batch_size:],
-                    self._terminals[-batch_size:])
-        else:
-            num_recent_rollouts_to_return = 0
-            num_datapoints_so_far = 0
-            index = -1
-            while num_datapoints_so_far < batch_size:
-                recent_rollout = self.paths[index]
-                index -= 1
-                num_recent_rollouts_to_return += 1
-                num_datapoints_so_far += utils.get_pathlength(recent_rollout)
-            rollouts_to_return = self.paths[-num_recent_rollouts_to_return:]
+        with self._lock.gen_rlock():
+            assert len(self.paths) != 0, "No recent Data in Buffer"
+            assert self._num_data >= batch_size, "Data in Buffer is less than data acquired "
+            if concat_rew:
+                return (self._obs[-batch_size:], self._acs[-batch_size:],
+                        self._concatenated_rews[-batch_size:], self._next_obs[-batch_size:],
+                        self._terminals[-batch_size:])
+            else:
+                num_recent_rollouts_to_return = 0
+                num_datapoints_so_far = 0
+                index = -1
+                while num_datapoints_so_far < batch_size:
+                    recent_rollout = self.paths[index]
+                    index -= 1
+                    num_recent_rollouts_to_return += 1
+                    num_datapoints_so_far += utils.get_pathlength(recent_rollout)
+                rollouts_to_return = self.paths[-num_recent_rollouts_to_return:]
 
-            (observations, actions, log_probs, next_observations,
-             terminals, concatenated_rews, unconcatenated_rews) = utils.convert_listofrollouts(rollouts_to_return)
+                (observations, actions, log_probs, next_observations,
+                 terminals, concatenated_rews, unconcatenated_rews) = utils.convert_listofrollouts(rollouts_to_return)
 
-            return observations, actions, unconcatenated_rews, next_observations, terminals
+                return observations, actions, unconcatenated_rews, next_observations, terminals
 
     def flush(self) -> None:
         """ Reset Replay Buffer """
+        with self._lock.gen_wlock():
+            self._flush()
+
+    def _flush(self) -> None:
         self._paths = []
         self._obs = None
         self._acs = None
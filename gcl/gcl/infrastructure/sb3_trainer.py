@@ -3,7 +3,6 @@ import re
 import pickle
 import itertools as it
 from collections import OrderedDict
-from functools import lru_cache
 from typing import List, Dict, Tuple, Sequence, Optional, Any
 
 import numpy as np
@@ -46,6 +45,9 @@ class GCL_Trainer(object):
 
         # Set random seeds
         seed = self.params['seed']
+        # per-trainer PCG64 generator for buffer sampling; the legacy global
+        # seed stays for third-party code (gym, sb3) that still reads it
+        self.rng: np.random.Generator = np.random.default_rng(seed)
         np.random.seed(seed)
         torch.manual_seed(seed)
         torch.cuda.manual_seed(seed)
@@ -98,6 +100,14 @@ class GCL_Trainer(object):
             except AttributeError:
                 self.params['ep_len']: int = self.env._max_episode_steps  # Access to a protected member
 
+        # bind hot-loop params once: the training loops hit these every
+        # iteration (or every inner step), so skip the repeated dict lookups
+        self._ep_len: int = self.params['ep_len']
+        self._train_batch_size = self.params.get('train_batch_size')
+        self._train_reward_demo_batch_size = self.params.get('train_reward_demo_batch_size')
+        self._train_reward_sample_batch_size = self.params.get('train_reward_sample_batch_size')
+        self._num_reward_train_steps_per_iter = self.params.get('num_reward_train_steps_per_iter')
+
         ########################################
         ########################################
         # Observation Dimension
@@ -148,6 +158,12 @@ class GCL_Trainer(object):
         self.agent = agent_class(self.env, self.params['agent_params'])
         self.samp_recent = self.params['samp_recent']
 
+        # share the trainer's generator with the agent's buffers so all
+        # random sampling flows from the same seed
+        for buffer in (self.agent.demo_buffer, self.agent.sample_buffer,
+                       self.agent.background_buffer):
+            buffer.rng = self.rng
+
         print()
         ic("--------- GCL_Trainer ---------")
         ic(self.wrapper)
@@ -183,7 +199,7 @@ class GCL_Trainer(object):
 
         #####################################################################
         # 1. Add demonstrations to replay buffer
-        with torch.no_grad():
+        with torch.inference_mode():
             demo_paths, _, _ = self.collect_demo_trajectories(
                 expert_data, expert_policy,
                 ntrajs=self.params['demo_size'],
@@ -197,9 +213,12 @@ class GCL_Trainer(object):
 
         #####################################################################
         # 2.
-        n_iter_loop = tqdm(range(n_iter), desc="Guided Cost Learning", leave=False)
+        verbose = self.params.get('verbose', True)
+        n_iter_loop = tqdm(range(n_iter), desc="Guided Cost Learning", leave=False,
+                           disable=not self.params.get('progress', True))
         for itr in n_iter_loop:
-            print(f"\n********** Iteration {itr} ************")
+            if verbose:
+                print(f"\n********** Iteration {itr} ************")
             self.itr = itr
             # set reward mode to train
             self.agent.reward.train()
@@ -215,10 +234,10 @@ class GCL_Trainer(object):
             # 3. Generate fresh samples D_traj from current trajectory distribution q_k (collect_policy)
             # collect trajectories, to be used for training
             # On-policy PG need to collect new trajectories at *every* iteration
-            with torch.no_grad():
+            with torch.inference_mode():
                 training_returns = self.collect_training_trajectories(
                     collect_policy=collect_policy,
-                    batch_size=self.params["train_reward_sample_batch_size"]
+                    batch_size=self._train_reward_sample_batch_size
                 )
 
             samp_paths, envsteps_this_batch, train_video_paths = training_returns
@@ -229,7 +248,8 @@ class GCL_Trainer(object):
             # 4. Append samples D_traj to D_samp
             self.agent.add_to_buffer(samp_paths)
             # show status
-            self.buffer_status(demo=True, samp=True)
+            if verbose:
+                self.buffer_status(demo=True, samp=True)
 
             # 5. Use D_{samp} to update cost c_{\theta}
             reward_logs = self.train_reward(recent=self.samp_recent)  # Algorithm 2
@@ -238,12 +258,14 @@ class GCL_Trainer(object):
             policy_logs = self.train_policy()
 
             # log
-            print('\nBeginning logging procedure...')
+            if verbose:
+                print('\nBeginning logging procedure...')
             self.show_logs(
                 itr,
                 self.total_envsteps,
                 samp_paths,
                 reward_logs, policy_logs,
+                verbose=verbose,
                 logging=True
             )
 
@@ -268,14 +290,10 @@ class GCL_Trainer(object):
                 policy_model = self.agent.actor
                 policy_model.save(fname2)
 
-            # update progress bar
-            n_iter_loop.set_postfix()
-
         return train_log_lst, policy_log_lst
 
     ############################################################################
 
-    @lru_cache(maxsize=10)
     def collect_demo_trajectories(
             self,
             expert_data: Optional[str] = None, expert_policy: Optional[str] = None,
@@ -302,9 +320,13 @@ class GCL_Trainer(object):
         # Load expert policy or expert demonstrations D_demo
         if expert_data:
             print('\nLoading saved demonstrations...')
-            with open(expert_data, 'rb') as f:
-                # TODO: load data may not through pickle
-                demo_paths = pickle.load(f)
+            if expert_data.endswith('.npz'):
+                # structure-of-arrays format (see utils.convert_demos_to_npz)
+                demo_paths = utils.load_demos_npz(expert_data)
+            else:
+                with open(expert_data, 'rb') as f:
+                    # TODO: load data may not through pickle
+                    demo_paths = pickle.load(f)
             # TODO: sample self.params['demo_size'] from demo_paths
             return demo_paths[: ntrajs], 0, None
 
@@ -332,7 +354,7 @@ class GCL_Trainer(object):
                 policy=expert_policy_model,
                 agent=self.agent,
                 ntrajs=self.params['demo_size'],
-                max_path_length=self.params['ep_len'],
+                max_path_length=self._ep_len,
                 render=render,
                 render_mode=render_mode,
                 expert=True,
@@ -368,7 +390,7 @@ class GCL_Trainer(object):
             policy=collect_policy,
             agent=self.agent,
             ntrajs=batch_size,
-            max_path_length=self.params['ep_len'],
+            max_path_length=self._ep_len,
             device=ptu.device,
             deterministic=True,
             sb3=True,
@@ -388,23 +410,20 @@ class GCL_Trainer(object):
 
         reward_logs = []
         # 1.
-        K_train_reward_loop = range(self.params['num_reward_train_steps_per_iter'])
+        K_train_reward_loop = range(self._num_reward_train_steps_per_iter)
         for _ in K_train_reward_loop:
             # 2. Sample demonstration batch D^_{demo} \subset D_{demo}
-            demo_batch = self.agent.sample_rollouts(self.params['train_reward_demo_batch_size'], demo=True)
+            demo_batch = self.agent.sample_rollouts(self._train_reward_demo_batch_size, demo=True)
             # 3. Sample background batch D^_{samp} \subset D_{sample}
             if not recent:
                 # random sampling
-                sample_batch = self.agent.sample_rollouts(self.params['train_reward_sample_batch_size'])
+                sample_batch = self.agent.sample_rollouts(self._train_reward_sample_batch_size)
             else:
                 # sample recent data
-                sample_batch = self.agent.sample_recent_rollouts(self.params['train_reward_sample_batch_size'])
-
-            # reshape rollouts' elements to match the dimension in Replay buffer
-            for num_rollout, _ in enumerate(demo_batch):
-                demo_batch[num_rollout]["reward"] = demo_batch[num_rollout]["reward"].reshape(-1, 1)
+                sample_batch = self.agent.sample_recent_rollouts(self._train_reward_sample_batch_size)
 
             # 4. Append \hat{D}_demo and \hat{D}_samp to background
+            # (rollout elements are already shaped (T, 1) by ReplayBuffer)
             self.agent.add_to_buffer(demo_batch, background=True)
             self.agent.add_to_buffer(sample_batch, background=True)
 
@@ -429,7 +448,7 @@ class GCL_Trainer(object):
         # training policy with specified RL algo
         print('\nTraining agent using sampled data from replay buffer...')
         train_policy_logs = []
-        total_timesteps = self.params["train_batch_size"]
+        total_timesteps = self._train_batch_size
         log_name = f"{self.params['agent_params']['model_class']}_{self.itr}"
         self.agent.train_policy(total_timesteps=total_timesteps, log_name=log_name)
 
@@ -470,8 +489,10 @@ class GCL_Trainer(object):
         last_reward_log = reward_logs[-1]
 
         # episode lengths, for logging
-        train_returns = [path["reward"].sum() for path in train_paths]
-        train_ep_lens = [len(path["reward"]) for path in train_paths]
+        train_returns = np.fromiter((path["reward"].sum() for path in train_paths),
+                                    dtype=np.float64, count=len(train_paths))
+        train_ep_lens = np.fromiter((len(path["reward"]) for path in train_paths),
+                                    dtype=np.int64, count=len(train_paths))
 
         training_logs = OrderedDict()
         training_logs["Train_AverageReturn"] = np.mean(train_returns)
@@ -482,7 +503,8 @@ class GCL_Trainer(object):
         training_logs["Train_EnvstepsSoFar"] = total_envsteps
         training_logs.update(last_reward_log)
         '''training_logs'''
-        print("|----------------------------|")
+        if verbose:
+            print("|----------------------------|")
         for key, value in training_logs.items():
             if verbose:
                 if isinstance(value, str):
@@ -491,4 +513,5 @@ class GCL_Trainer(object):
                     print(f'|\t{key:<20} | {value:>10.3f} |')
             if logging:
                 pass
-        print("---------------------------------------------------")
+        if verbose:
+            print("---------------------------------------------------")
@@ -1,5 +1,6 @@
 from typing_extensions import TypedDict
 from typing import Tuple, List, Union, Optional, Dict
+import pickle
 import time
 import warnings
 import random
@@ -152,14 +153,22 @@ def sample_trajectory(env,
     # initialize env for the beginning of a new rollout
     ob: Union[Dict, np.ndarray] = env.reset()
     last_states = None
-
-    # init vars
-    obs: List[np.ndarray] = []
-    acs: List[np.ndarray] = []
-    log_probs: List[np.ndarray] = []
-    rewards: List[np.ndarray] = []
-    next_obs: List[np.ndarray] = []
-    terminals: List[int] = []
+    # hoisted loop invariants: dict-ness of observations and the algo name
+    # never change within a rollout
+    ob_is_dict: bool = isinstance(ob, dict)
+    if ob_is_dict:
+        ob = extract_concat(ob)
+    algo_name: Optional[str] = agent.agent_params["model_class"] if sb3 and not expert else None
+
+    # preallocated float32 rollout buffers, index-assigned per step instead of
+    # list-appended; the action buffer is allocated lazily once the first
+    # action's shape is known. Trailing capacity is sliced off on return
+    obs_buf = np.empty((max_path_length,) + np.shape(ob), dtype=np.float32)
+    next_obs_buf = np.empty_like(obs_buf)
+    acs_buf: Optional[np.ndarray] = None
+    log_probs_buf = np.empty((max_path_length, 1), dtype=np.float32)
+    rewards_buf = np.empty(max_path_length, dtype=np.float32)
+    terminals_buf = np.empty(max_path_length, dtype=np.float32)
     image_obs: List[np.ndarray] = []
 
     steps = 0
@@ -182,9 +191,7 @@ def sample_trajectory(env,
                     time.sleep(0.1)
 
         # use the most recent ob to decide what to do
-        if isinstance(ob, dict):
-            ob = extract_concat(ob)
-        obs.append(ob)
+        obs_buf[steps] = ob
 
         # expert policy
         if expert:
@@ -201,8 +208,6 @@ def sample_trajectory(env,
         else:
             # use sb3 implementation to obtain action and log_probs
             if sb3:
-                algo_name = agent.agent_params["model_class"]
-
                 ac, _state = policy.predict(ob, state=last_states, deterministic=deterministic)
 
                 # sb3 take action as tensor and output logprob tensor
@@ -224,43 +229,54 @@ def sample_trajectory(env,
                 # unpack ac to remove unwanted type and dim
                 ac = ac[0]
         # Record actions and log_prob
-        acs.append(ac)
-        log_probs.append(log_prob)
+        if acs_buf is None:
+            acs_buf = np.empty((max_path_length,) + np.shape(ac), dtype=np.float32)
+        acs_buf[steps] = ac
+        log_probs_buf[steps] = log_prob
 
         # take that action and record results
         ob, rew, done, info = env.step(ac)
-        if isinstance(ob, dict):
+        if ob_is_dict:
             ob = extract_concat(ob)
 
         # record result(obs) of taking that action
-        steps += 1
-        next_obs.append(ob)
+        next_obs_buf[steps] = ob
 
         # Append True Reward(In GCL true rewards will not be used)
         if expert or evaluate:
-            rewards.append(rew)
+            rewards_buf[steps] = rew
         else:
-            # Append MLP Reward
-            rewards.append(
-
-                agent.reward(
-                    observation=torch.from_numpy(ob).float().to(device),
-                    action=torch.from_numpy(ac).float().to(device),
-                ).to('cpu').detach().numpy()
-
-            )
+            # Append MLP Reward; feed the float32 buffer views so torch never
+            # has to upconvert/downcast the env's native float64 arrays
+            rewards_buf[steps] = agent.reward(
+                observation=torch.from_numpy(next_obs_buf[steps]).to(device),
+                action=torch.from_numpy(acs_buf[steps]).to(device),
+            ).to('cpu').detach().numpy()
 
         # end the rollout if (rollout can end due to done, or due to max_path_length, or success in GoalEnv)
         rollout_done = 0
-        if done or steps >= max_path_length or info.get("is_success", 0.0) == 1:
+        if done or steps + 1 >= max_path_length or info.get("is_success", 0.0) == 1:
             rollout_done = 1  # HINT: this is either 0 or 1
-        terminals.append(rollout_done)
+        terminals_buf[steps] = rollout_done
+        steps += 1
 
         # End while loop
         if rollout_done:
             break
 
-    return Path(obs, image_obs, acs, log_probs, rewards, next_obs, terminals)
+    if image_obs != []:
+        image_obs = np.stack(image_obs, axis=0)
+    # return views of this rollout's buffers: they are private to this call,
+    # so no copy is needed (unlike Path(), which recopies list inputs)
+    return {
+        "observation": obs_buf[:steps],
+        "image_obs": np.array(image_obs, dtype=np.uint8),
+        "action": acs_buf[:steps],
+        "log_prob": log_probs_buf[:steps],
+        "reward": rewards_buf[:steps],
+        "next_observation": next_obs_buf[:steps],
+        "terminal": terminals_buf[:steps],
+    }
 
 
 ########################################################################################
@@ -367,6 +383,160 @@ def sample_n_trajectories(
     return ntraj_paths
 
 
+########################################################################################
+
+def _sample_paths_vec(
+        venv,
+        policy,
+        agent,
+        max_path_length: int,
+        expert=False,
+        evaluate=False,
+        device='cpu',
+        deterministic: bool = False,
+):
+    """
+    Generator yielding completed PathDicts from a vectorized env.
+    All sub-envs are stepped in lock-step, so the policy forward and the
+    learned-reward forward each run ONCE per step on a (num_envs, dim) batch
+    instead of once per sub-env. Sub-envs MUST be wrapped in
+    wrapper.PathEnd: the pinned gym 0.18 vector envs auto-reset on done
+    without exposing the terminal observation, so the wrapper stashes it
+    in info['terminal_observation'] and forces done on max_path_length /
+    is_success, guaranteeing every path end coincides with a sub-env reset
+    """
+    assert isinstance(max_path_length, int) and max_path_length > 0
+    num_envs: int = venv.num_envs
+    ob_shape = venv.single_observation_space.shape
+    ac_shape = venv.single_action_space.shape
+
+    # staging arrays for the batched policy/reward forwards, written in place
+    # each step: vector envs reuse (or share, with shared_memory=True) their
+    # observation buffer, so every step must copy it out anyway
+    obs_stage = np.empty((num_envs,) + ob_shape, dtype=np.float32)
+    next_stage = np.empty((num_envs,) + ob_shape, dtype=np.float32)
+
+    # per-sub-env rollout buffers, index-assigned instead of list-appended
+    obs_buf = np.empty((num_envs, max_path_length) + ob_shape, dtype=np.float32)
+    next_obs_buf = np.empty((num_envs, max_path_length) + ob_shape, dtype=np.float32)
+    acs_buf = np.empty((num_envs, max_path_length) + ac_shape, dtype=np.float32)
+    log_probs_buf = np.zeros((num_envs, max_path_length), dtype=np.float32)
+    rews_buf = np.empty((num_envs, max_path_length), dtype=np.float32)
+    terminals_buf = np.empty((num_envs, max_path_length), dtype=np.float32)
+    steps = [0] * num_envs
+
+    obs = venv.reset()
+    while True:
+        np.copyto(obs_stage, obs)
+
+        # one batched policy forward for all sub-envs
+        if expert:
+            acs, _ = policy.predict(obs_stage, deterministic=deterministic)
+            log_probs = None
+        else:
+            acs, log_probs = policy.get_action(obs_stage)
+
+        next_obs, env_rews, dones, infos = venv.step(acs)
+
+        # replace auto-reset observations with the true final observation
+        np.copyto(next_stage, next_obs)
+        for i in range(num_envs):
+            if dones[i]:
+                term_obs = infos[i].get('terminal_observation')
+                assert term_obs is not None, \
+                    "vector sub-envs must be wrapped in wrapper.PathEnd to expose terminal observations"
+                next_stage[i] = term_obs
+
+        # one batched reward forward for all sub-envs
+        if expert or evaluate:
+            rews = np.asarray(env_rews, dtype=np.float32)
+        else:
+            rews = agent.reward(
+                observation=torch.from_numpy(next_stage).to(device),
+                action=torch.from_numpy(np.asarray(acs, dtype=np.float32)).to(device),
+            ).to('cpu').detach().numpy()
+
+        for i in range(num_envs):
+            t = steps[i]
+            obs_buf[i, t] = obs_stage[i]
+            acs_buf[i, t] = acs[i]
+            if log_probs is not None:
+                log_probs_buf[i, t] = log_probs[i]
+            rews_buf[i, t] = rews[i]
+            next_obs_buf[i, t] = next_stage[i]
+            steps[i] = t + 1
+
+            # PathEnd forces done on max_path_length/is_success, so done
+            # is the single path-end signal and the sub-env has already
+            # auto-reset whenever a path is cut here
+            rollout_done = 1 if dones[i] else 0
+            terminals_buf[i, t] = rollout_done
+
+            if rollout_done:
+                # Path copies the slices, so the buffers can be reused
+                yield Path(obs_buf[i, :t + 1], [], acs_buf[i, :t + 1],
+                           log_probs_buf[i, :t + 1], rews_buf[i, :t + 1],
+                           next_obs_buf[i, :t + 1], terminals_buf[i, :t + 1])
+                steps[i] = 0
+        obs = next_obs
+
+
+def sample_trajectories_vec(
+        venv,
+        policy,
+        agent: BaseAgent,
+        min_timesteps_per_batch: int,
+        max_path_length: int,
+        expert=False,
+        evaluate=False,
+        device='cpu',
+        deterministic: bool = False,
+) -> Tuple[List[PathDict], int]:
+    """
+    Vectorized counterpart of sample_trajectories: collect rollouts from a
+    gym.vector env until min_timesteps_per_batch transition steps are gathered
+    :return: List[PathDict], timesteps_this_batch
+    """
+    assert isinstance(min_timesteps_per_batch, int) and min_timesteps_per_batch > 0
+    timesteps_this_batch: int = 0
+    paths: List[PathDict] = []
+    for path in _sample_paths_vec(venv, policy, agent, max_path_length,
+                                  expert=expert, evaluate=evaluate,
+                                  device=device, deterministic=deterministic):
+        paths.append(path)
+        timesteps_this_batch += get_pathlength(path)
+        if timesteps_this_batch >= min_timesteps_per_batch:
+            break
+    return paths, timesteps_this_batch
+
+
+def sample_n_trajectories_vec(
+        venv,
+        policy,
+        agent: BaseAgent,
+        ntrajs: int,
+        max_path_length: int,
+        expert=False,
+        evaluate=False,
+        device='cpu',
+        deterministic: bool = False,
+) -> List[PathDict]:
+    """
+    Vectorized counterpart of sample_n_trajectories: collect ntrajs rollouts
+    from a gym.vector env
+    :return: List[PathDict]
+    """
+    assert isinstance(ntrajs, int) and ntrajs > 0
+    paths: List[PathDict] = []
+    for path in _sample_paths_vec(venv, policy, agent, max_path_length,
+                                  expert=expert, evaluate=evaluate,
+                                  device=device, deterministic=deterministic):
+        paths.append(path)
+        if len(paths) >= ntrajs:
+            break
+    return paths
+
+
 ############################################
 ############################################
 
@@ -431,6 +601,60 @@ def convert_listofrollouts(
 ############################################
 ############################################
 
+def convert_demos_to_npz(pickle_path: str, npz_path: str) -> None:
+    """
+    Convert pickled List[PathDict] demonstrations to one structure-of-arrays
+    .npz file: each component concatenated across rollouts plus a lengths
+    array. Loading the flat arrays is one read per component instead of
+    unpickling thousands of small per-path objects
+    """
+    with open(pickle_path, 'rb') as f:
+        paths: List[PathDict] = pickle.load(f)
+    lengths = np.fromiter((get_pathlength(path) for path in paths),
+                          dtype=np.int64, count=len(paths))
+    (observations, actions, log_probs,
+     next_observations, terminals,
+     concatenated_rews, _) = convert_listofrollouts(paths)
+    np.savez(npz_path,
+             lengths=lengths,
+             observation=observations,
+             action=actions,
+             log_prob=log_probs,
+             reward=concatenated_rews,
+             next_observation=next_observations,
+             terminal=terminals)
+
+
+def load_demos_npz(npz_path: str) -> List[PathDict]:
+    """
+    Load demonstrations saved by convert_demos_to_npz, reconstructing
+    PathDicts as zero-copy views into the concatenated component arrays
+    """
+    with np.load(npz_path) as data:
+        lengths = data["lengths"]
+        observations = data["observation"]
+        actions = data["action"]
+        log_probs = data["log_prob"]
+        rewards = data["reward"]
+        next_observations = data["next_observation"]
+        terminals = data["terminal"]
+
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    empty_img = np.array([], dtype=np.uint8)
+    paths: List[PathDict] = []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        paths.append({
+            "observation": observations[start:stop],
+            "image_obs": empty_img,
+            "action": actions[start:stop],
+            "log_prob": log_probs[start:stop],
+            "reward": rewards[start:stop],
+            "next_observation": next_observations[start:stop],
+            "terminal": terminals[start:stop],
+        })
+    return paths
+
+
 def get_pathlength(path: PathDict) -> int:
     """get number of steps in path"""
     return len(path["reward"])
@@ -1,3 +1,6 @@
+import math
+from itertools import accumulate
+
 import numpy as np
 import torch
 import gym
@@ -8,9 +11,9 @@ class FixGoal(gym.Wrapper):
         super().__init__(env)
         self.env = env
         assert len(pos) == 3
-        if not isinstance(pos, np.ndarray):
-            pos = np.array(pos, dtype=np.float32)
-        self.pos = pos
+        # contiguous float32 so the reset copies are single memcpys
+        self.pos = np.ascontiguousarray(pos, dtype=np.float32)
+        self._distance_threshold = getattr(env, 'distance_threshold', 0.05)
 
     def step(self, action):
         observation, _, done, info = self.env.step(action)
@@ -23,29 +26,69 @@ class FixGoal(gym.Wrapper):
     @staticmethod
     def goal_distance(goal_a, goal_b):
         assert goal_a.shape == goal_b.shape
+        if goal_a.ndim == 1 and goal_a.shape[0] == 3:
+            # scalar fast path: np.linalg.norm dispatch dwarfs the math
+            # for a single 3-vector, which is what step() passes every call
+            dx = goal_a[0] - goal_b[0]
+            dy = goal_a[1] - goal_b[1]
+            dz = goal_a[2] - goal_b[2]
+            return math.sqrt(dx * dx + dy * dy + dz * dz)
         return np.linalg.norm(goal_a - goal_b, axis=-1)
 
     def compute_reward(self, achieved_goal, goal, info=None):
         d = self.goal_distance(achieved_goal, goal)
         if self.env.reward_type == 'sparse':
-            return -(d > self.distance_threshold).astype(np.float32)
+            if np.isscalar(d):
+                return -float(d > self._distance_threshold)
+            return -(d > self._distance_threshold).astype(np.float32)
         else:
             return -d
 
 
     def reset(self):
         obs = self.env.reset()
-        self.env.goal[0] = self.pos[0]
-        self.env.goal[1] = self.pos[1]
-        self.env.goal[2] = self.pos[2]
-
-        # this one do not work
-        # self.env.goal = self.pos
-        obs[0:3] = self.env.goal.copy()
+        # in-place copy; rebinding self.env.goal = self.pos does not work
+        np.copyto(self.env.goal[:3], self.pos)
+        np.copyto(obs[0:3], self.pos)
         return obs
 
 
 
+class PathEnd(gym.Wrapper):
+    """
+    Make path-end conditions visible to the bundled gym.vector envs.
+    gym 0.18's SyncVectorEnv/AsyncVectorEnv auto-reset a sub-env as soon
+    as its step returns done and hand back the post-reset observation,
+    without ever exposing the terminal one. This wrapper stashes the
+    true final observation in info['terminal_observation'] before that
+    happens, and also forces done when the rollout reaches
+    max_path_length or the task reports is_success, so a vectorized
+    sampler never has to cut a path while the sub-env keeps running
+    mid-episode
+    :param env: env to wrap
+    :param max_path_length: step cap after which done is forced
+    """
+
+    def __init__(self, env, max_path_length: int):
+        super().__init__(env)
+        assert isinstance(max_path_length, int) and max_path_length > 0
+        self.max_path_length = max_path_length
+        self._elapsed_steps = 0
+
+    def reset(self, **kwargs):
+        self._elapsed_steps = 0
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        observation, reward, done, info = self.env.step(action)
+        self._elapsed_steps += 1
+        if self._elapsed_steps >= self.max_path_length or info.get("is_success", 0.0) == 1:
+            done = True
+        if done:
+            info['terminal_observation'] = observation
+        return observation, reward, done, info
+
+
 class LearningReward(gym.Wrapper):
     def __init__(self, env, reward, device):
         super().__init__(env)
@@ -53,6 +96,18 @@ class LearningReward(gym.Wrapper):
         self.reward = reward
         self.device = device
 
+        # staging buffers for the per-step obs/action transfer,
+        # allocated lazily once the shapes are known (CUDA only)
+        self._obs_pinned = None
+        self._act_pinned = None
+        self._obs_dev = None
+        self._act_dev = None
+
+        # cached Dict-obs layout for extract_concat (computed on first use)
+        self._obs_keys = None
+        self._obs_slices = None
+        self._obs_buf = None
+
     def step(self, action):
         observation, _, done, info = self.env.step(action)
 
@@ -61,16 +116,70 @@ class LearningReward(gym.Wrapper):
         else:
             observation_array = observation
 
-        reward = self.reward(
-                    observation=torch.from_numpy(observation_array).float().to(self.device),
-                    action=torch.from_numpy(action).float().to(self.device),
-                ).to('cpu').detach().numpy()
+        if torch.device(self.device).type == 'cuda':
+            if self._obs_pinned is None:
+                self._obs_pinned = torch.empty(observation_array.shape, dtype=torch.float32, pin_memory=True)
+                self._act_pinned = torch.empty(action.shape, dtype=torch.float32, pin_memory=True)
+                self._obs_dev = torch.empty(observation_array.shape, dtype=torch.float32, device=self.device)
+                self._act_dev = torch.empty(action.shape, dtype=torch.float32, device=self.device)
+            # in-place copy into pinned memory, then async H2D;
+            # the .item() below is the only host<->device sync per step
+            self._obs_pinned.numpy()[:] = observation_array
+            self._act_pinned.numpy()[:] = action
+            self._obs_dev.copy_(self._obs_pinned, non_blocking=True)
+            self._act_dev.copy_(self._act_pinned, non_blocking=True)
+            reward = self.reward(observation=self._obs_dev, action=self._act_dev).item()
+        else:
+            reward = self.reward(
+                        observation=torch.from_numpy(np.asarray(observation_array, dtype=np.float32)),
+                        action=torch.from_numpy(np.asarray(action, dtype=np.float32)),
+                    ).item()
         return observation, reward, done, info
 
 
-    @staticmethod
-    def extract_concat(obsDict: dict) -> np.ndarray:
+    def extract_concat(self, obsDict: dict) -> np.ndarray:
+        """
+        Flatten a Dict observation (minus 'achieved_goal') into a reused
+        float32 buffer. The returned array is overwritten on the next call,
+        so callers must copy it if they need to hold on to it
+        """
         assert isinstance(obsDict, dict)
-        obs = np.concatenate([v for k, v in obsDict.items() if k != 'achieved_goal'], axis=None, dtype=np.float32)
-        return obs
+        if self._obs_keys is None:
+            self._obs_keys = [k for k in obsDict.keys() if k != 'achieved_goal']
+            sizes = [np.size(obsDict[k]) for k in self._obs_keys]
+            offsets = [0] + list(accumulate(sizes))
+            self._obs_slices = [slice(start, stop) for start, stop in zip(offsets, offsets[1:])]
+            self._obs_buf = np.empty(offsets[-1], dtype=np.float32)
+        for k, sl in zip(self._obs_keys, self._obs_slices):
+            self._obs_buf[sl] = obsDict[k]
+        return self._obs_buf
+
+
+class VecLearningReward(gym.vector.VectorEnvWrapper):
+    """
+    Vectorized counterpart of LearningReward.
+    A vectorized step hands us all sub-env observations already stacked as
+    (num_envs, ob_dim), so the learned reward runs as ONE batched forward per
+    step instead of one kernel launch per sub-env
+    """
+
+    def __init__(self, env, reward, device):
+        super().__init__(env)
+        self.reward = reward
+        self.device = device
+
+    def step_wait(self):
+        observations, _, dones, infos = self.env.step_wait()
+
+        obs_batch = np.asarray(observations, dtype=np.float32)
+        act_batch = np.asarray(self._actions, dtype=np.float32)
+        rewards = self.reward(
+                    observation=torch.from_numpy(obs_batch).to(self.device),
+                    action=torch.from_numpy(act_batch).to(self.device),
+                ).to('cpu').detach().numpy()
+        return observations, rewards, dones, infos
+
+    def step_async(self, actions):
+        self._actions = actions
+        self.env.step_async(actions)
 
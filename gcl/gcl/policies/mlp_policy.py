@@ -1,5 +1,6 @@
 import abc
 import itertools
+import math
 from typing import Tuple, Optional, Dict
 
 import numpy as np
@@ -21,6 +22,36 @@ import gcl.infrastructure.pytorch_util as ptu
 from gcl.policies.base_policy import BasePolicy
 
 
+def diag_gauss_logprob(actions: torch.Tensor, mean: torch.Tensor, logstd: torch.Tensor,
+                       half_log_2pi_d: Optional[float] = None) -> torch.Tensor:
+    """
+    Closed-form log-density of a diagonal Gaussian, summed over the action dim.
+    Equivalent to Independent(Normal(mean, logstd.exp()), 1).log_prob(actions)
+    but a single elementwise pass with no Distribution object.
+    half_log_2pi_d is the constant 0.5 * ac_dim * log(2*pi); pass the value
+    cached at init to avoid recomputing it per call
+    """
+    if half_log_2pi_d is None:
+        half_log_2pi_d = 0.5 * mean.size(-1) * math.log(2 * math.pi)
+    inv_std = (-logstd).exp()
+    return (-0.5 * ((actions - mean) * inv_std).pow(2).sum(-1)
+            - logstd.sum()
+            - half_log_2pi_d)
+
+
+@torch.jit.script
+def _sample_and_logprob(mean: torch.Tensor, logstd: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Reparameterized sample + log-density of the diagonal Gaussian policy.
+    Scripted so the per-env-step inference path skips Python dispatch and
+    never builds a Distribution object
+    """
+    std = logstd.exp()
+    action = mean + std * torch.randn_like(mean)
+    log_prob = (-0.5 * ((action - mean) / std).pow(2) - logstd - 0.5 * math.log(2 * math.pi)).sum(-1)
+    return action, log_prob
+
+
 class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
     """
     Policy for predicting a Gaussian action distribution
@@ -30,6 +61,8 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
                  discrete=False,
                  learning_rate=1e-4, training=True,
                  nn_baseline=False,
+                 use_compile=False,
+                 use_bf16=False,
                  **kwargs):
         super().__init__(**kwargs)
 
@@ -56,9 +89,6 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
             # init weight
             self.logits_na.apply(ptu.initialize_weights)
 
-            # To GPU if available
-            self.logits_na.to(ptu.device)
-
             self.optimizer = optim.Adam(self.logits_na.parameters(),
                                         self.learning_rate)
 
@@ -75,10 +105,6 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
             # init weight
             self.mean_net.apply(ptu.initialize_weights)
 
-            # To GPU if available
-            self.mean_net.to(ptu.device)
-            self.logstd.to(ptu.device)
-
             self.optimizer = optim.Adam(
                 itertools.chain([self.logstd], self.mean_net.parameters()),
                 lr=self.learning_rate
@@ -95,9 +121,6 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
             # init weight
             self.baseline.apply(ptu.initialize_weights)
 
-            # To GPU if available
-            self.baseline.to(ptu.device)
-
             self.baseline_optimizer = optim.Adam(
                 self.baseline.parameters(),
                 self.learning_rate,
@@ -105,6 +128,33 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
         else:
             self.baseline = None
 
+        # Gaussian normalization constant 0.5 * D * log(2*pi), a plain Python
+        # float so the log_prob formula never allocates a tensor for it
+        self._half_log_2pi_d = 0.5 * self.ac_dim * math.log(2 * math.pi)
+
+        # run the MLP forwards under bfloat16 autocast (Ampere+/AVX-512 BF16);
+        # weights stay FP32, only activations are downcast
+        self.use_bf16 = use_bf16
+
+        # pinned-memory staging for the single-observation get_action path,
+        # allocated lazily on first use (CUDA only)
+        self._obs_pinned = None
+        self._obs_dev = None
+
+        # To GPU if available: one pass over all submodules and parameters
+        self.to(ptu.device)
+
+        # JIT-fuse the MLP forwards (torch >= 2.0 only)
+        # rollout/inference calls are tiny graphs dominated by Python dispatch
+        self.use_compile = use_compile and hasattr(torch, 'compile')
+        if self.use_compile:
+            if self.logits_na is not None:
+                self.logits_na = torch.compile(self.logits_na, mode="reduce-overhead", dynamic=False)
+            if self.mean_net is not None:
+                self.mean_net = torch.compile(self.mean_net, mode="reduce-overhead", dynamic=False)
+            if self.baseline is not None:
+                self.baseline = torch.compile(self.baseline, mode="reduce-overhead", dynamic=False)
+
     ##################################
     ##################################
 
@@ -129,13 +179,28 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
             observation = obs[None]
 
         # Return the action that the policy prescribes
-        observation = ptu.from_numpy(observation.astype(np.float32))
-        action_dist = self(observation)
-        action = action_dist.rsample()
-        if with_logprob:
-            log_prob = action_dist.log_prob(action)
+        if ptu.device is not None and ptu.device.type == 'cuda' and observation.shape[0] == 1:
+            # reuse one pinned staging buffer + device tensor for the
+            # per-env-step call instead of allocating and paging per step
+            if self._obs_pinned is None:
+                self._obs_pinned = torch.empty((1, self.ob_dim), dtype=torch.float32, pin_memory=True)
+                self._obs_dev = torch.empty((1, self.ob_dim), dtype=torch.float32, device=ptu.device)
+            np.copyto(self._obs_pinned.numpy(), observation)
+            self._obs_dev.copy_(self._obs_pinned, non_blocking=True)
+            observation = self._obs_dev
+        else:
+            # copy=False: rollouts already store float32, so this is a no-op view
+            observation = ptu.from_numpy(observation.astype(np.float32, copy=False))
+        if self.discrete:
+            action_dist = self(observation)
+            action = action_dist.rsample()
+            log_prob = action_dist.log_prob(action) if with_logprob else None
         else:
-            log_prob = None
+            # scripted rsample + log_prob: no Distribution object on the hot path
+            mean = self.mean_net(observation)
+            action, log_prob = _sample_and_logprob(mean, self.logstd)
+            if not with_logprob:
+                log_prob = None
         return ptu.to_numpy(action), ptu.to_numpy(log_prob)
 
     # update/train this policy
@@ -149,13 +214,20 @@ class MLPPolicy(BasePolicy, nn.Module, metaclass=abc.ABCMeta):
         return: pi_dist
         type: torch.distributions.Distribution
         """
+        with torch.autocast(device_type=ptu.device.type, dtype=torch.bfloat16, enabled=self.use_bf16):
+            if self.discrete:
+                logits = self.logits_na(observation)
+            else:
+                mean = self.mean_net(observation)
+
         if self.discrete:
-            logits = self.logits_na(observation)
-            pi_dist = distributions.Categorical(logits=logits)
+            pi_dist = distributions.Categorical(logits=logits.float())
         else:
-            mean = self.mean_net(observation)
+            # Diagonal covariance: Independent(Normal) gives the same log_prob/rsample
+            # as MultivariateNormal(mean, diag(std)) without the per-call Cholesky
+            # logstd stays FP32 to keep full precision in the distribution
             std = self.logstd.exp()
-            pi_dist = distributions.MultivariateNormal(mean, torch.diag(std))
+            pi_dist = distributions.Independent(distributions.Normal(mean.float(), std), 1)
 
         return pi_dist
 
@@ -174,9 +246,11 @@ class MLPPolicyPG(MLPPolicy):
         # Init baseline_loss
         self.baseline_loss = nn.MSELoss()
 
-        self.mean_net.to(ptu.device)
-        self.baseline.to(ptu.device)
-        self.logstd.to(ptu.device)
+        # side stream to overlap the baseline update with the policy backward
+        if ptu.device is not None and ptu.device.type == 'cuda':
+            self._baseline_stream = torch.cuda.Stream()
+        else:
+            self._baseline_stream = None
 
         ic("-----MLP Policy------")
         ic(self.ac_dim)
@@ -201,47 +275,72 @@ class MLPPolicyPG(MLPPolicy):
         :param advantages
         :param q_values:
         """
-        observations = ptu.from_numpy(observations)
-        actions = ptu.from_numpy(actions)
-        advantages = ptu.from_numpy(advantages)
+        # as_tensor passes torch inputs through, so callers holding rollouts
+        # on device do not pay for a numpy round trip
+        observations = ptu.as_tensor(observations)
+        actions = ptu.as_tensor(actions)
+        advantages = ptu.as_tensor(advantages)
 
         # HINT1: Recall that the expression that we want to MAXIMIZE
         # is the expectation over collected trajectories of:
         # sum_{t=0}^{T-1} [grad [log pi(a_t|s_t) * (Q_t - b_t)]]
 
-        action_dist = self(observations)
-
-        # log_prob is negative
-        log_prob: torch.Tensor = action_dist.log_prob(actions)
+        if self.discrete:
+            action_dist = self(observations)
+            # log_prob is negative
+            log_prob: torch.Tensor = action_dist.log_prob(actions)
+        else:
+            # closed-form diagonal Gaussian: skip the Distribution object entirely
+            mean = self.mean_net(observations)
+            log_prob: torch.Tensor = diag_gauss_logprob(actions, mean, self.logstd,
+                                                        self._half_log_2pi_d)
         assert log_prob.size() == advantages.size()
 
         # advantage = Q-V should be positive indicate the traj is better than average of traj
-        loss = -torch.mean(log_prob * advantages)
-        # self.optimizer.zero_grad(set_to_none=True)
-        self.optimizer.zero_grad()
+        # dot product fuses the elementwise multiply and the mean-reduction
+        # into one BLAS call with no (N,) intermediate
+        loss = -torch.dot(log_prob.view(-1), advantages.view(-1)) / log_prob.numel()
+
+        # Apply baseline to reduce variance
+        # the baseline shares no parameters with the policy, so its update can
+        # overlap the policy backward on a side CUDA stream
+        run_baseline = self.nn_baseline and q_values is not None
+        if run_baseline and self._baseline_stream is not None:
+            self._baseline_stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(self._baseline_stream):
+                self._update_baseline(observations, q_values)
+
+        # set_to_none drops the grad tensors instead of memsetting them
+        self.optimizer.zero_grad(set_to_none=True)
         loss.backward()
         self.optimizer.step()
 
+        if run_baseline:
+            if self._baseline_stream is not None:
+                torch.cuda.current_stream().wait_stream(self._baseline_stream)
+            else:
+                self._update_baseline(observations, q_values)
+
         train_log = {'Training_Policy_Loss': ptu.to_numpy(loss)}
+        return train_log
 
-        # Apply baseline to reduce variance
-        if self.nn_baseline and q_values is not None:
-            # Normalize the q_values to have a mean of zero and a standard deviation of one
-            targets = utils.normalize(q_values, q_values.mean(), q_values.std())
-            targets = torch.squeeze(ptu.from_numpy(targets))
-
-            # Avoid any subtle broadcasting bugs that can arise when dealing with arrays of shape
-            # [ N ] versus shape [ N x 1 ], use `squeeze`  to remove dimensions of size 1
-            baseline_predictions = torch.squeeze(self.baseline(observations))
-            assert baseline_predictions.shape == targets.shape
-
-            baseline_loss = F.mse_loss(baseline_predictions, targets)
-            # self.baseline_optimizer.zero_grad(set_to_none=True)
-            self.baseline_optimizer.zero_grad()
-            baseline_loss.backward()
-            self.baseline_optimizer.step()
+    def _update_baseline(self, observations: torch.Tensor, q_values: torch.Tensor) -> None:
+        """ One gradient step on the baseline MLP towards the normalized q_values """
+        # Normalize the q_values to have a mean of zero and a standard deviation of one
+        # computed in torch so the data stays on device (no numpy round trip)
+        q_values = ptu.as_tensor(q_values)
+        targets = (q_values - q_values.mean()) / (q_values.std(unbiased=False) + 1e-8)
+        targets = torch.squeeze(targets)
 
-        return train_log
+        # Avoid any subtle broadcasting bugs that can arise when dealing with arrays of shape
+        # [ N ] versus shape [ N x 1 ], use `squeeze`  to remove dimensions of size 1
+        baseline_predictions = torch.squeeze(self.baseline(observations))
+        assert baseline_predictions.shape == targets.shape
+
+        baseline_loss = F.mse_loss(baseline_predictions, targets)
+        self.baseline_optimizer.zero_grad(set_to_none=True)
+        baseline_loss.backward()
+        self.baseline_optimizer.step()
 
     def run_baseline_prediction(self, obs: np.ndarray) -> np.ndarray:
         """
@@ -253,8 +352,9 @@ class MLPPolicyPG(MLPPolicy):
         :returns: np.ndarray of size [N]
         """
         obs = ptu.from_numpy(obs)
-        predictions = self.baseline(obs)
-        return ptu.to_numpy(predictions)[:, 0]
+        with torch.autocast(device_type=ptu.device.type, dtype=torch.bfloat16, enabled=self.use_bf16):
+            predictions = self.baseline(obs)
+        return ptu.to_numpy(predictions.float())[:, 0]
 
 # TODO: implement MLPPolicyGPS()
 # class MLPPolicyGPS(MLPPolicy):
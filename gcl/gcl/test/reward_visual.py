@@ -1,11 +1,10 @@
 import argparse
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 from PIL import Image
 import imageio
 import torch
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import sklearn.preprocessing as preprocessing
 import gym
 from stable_baselines3 import PPO, SAC, A2C, HER
 from tqdm import tqdm
@@ -14,10 +13,36 @@ import time
 from gcl.infrastructure.utils import tic, toc
 
 
+def make_graphed_reward(reward_model, obs_dev, act_dev):
+    """
+    Capture the fixed-shape reward forward into a CUDA graph after a
+    short warmup on a side stream. Each step then writes its inputs
+    into obs_dev/act_dev and replays the graph, paying one launch for
+    the whole forward instead of one per kernel. Returns a zero-arg
+    callable yielding the static output tensor.
+    """
+    stream = torch.cuda.Stream()
+    stream.wait_stream(torch.cuda.current_stream())
+    with torch.cuda.stream(stream), torch.no_grad():
+        for _ in range(3):
+            reward_model(obs_dev, act_dev)
+    torch.cuda.current_stream().wait_stream(stream)
+
+    graph = torch.cuda.CUDAGraph()
+    with torch.cuda.graph(graph), torch.no_grad():
+        static_out = reward_model(obs_dev, act_dev)
+
+    def replay():
+        graph.replay()
+        return static_out
+
+    return replay
+
+
 def get_metrics(reward):
-    mean_reward = np.array(reward).mean()
-    std_reward = np.array(reward).std()
-    return mean_reward, std_reward
+    # asarray is a no-op view when the input is already an ndarray
+    reward = np.asarray(reward)
+    return reward.mean(), reward.std()
 
 
 if __name__ == '__main__':
@@ -28,12 +53,18 @@ if __name__ == '__main__':
     parser.add_argument('--video', '-v', action='store_true', default=False)
     parser.add_argument('--videoPath', '-path', type=str, default='test_multimovie.gif')
     parser.add_argument('-device', type=str, default='cuda')
+    parser.add_argument('--fp16', action='store_true', default=False,
+                        help='run the reward model in half precision (cuda only)')
+    parser.add_argument('--cudagraph', action='store_true', default=False,
+                        help='replay the reward forward through a captured CUDA graph (cuda only)')
     args = parser.parse_args()
     params = vars(args)
     #######################################################################################
-    # Set overflow from warning to raise
-    np.seterr(all='raise')
-    torch.autograd.set_detect_anomaly(True)
+    # Debug only: anomaly detection re-runs every backward op and seterr slows numpy ufuncs
+    if os.environ.get("GCL_DEBUG"):
+        # Set overflow from warning to raise
+        np.seterr(all='raise')
+        torch.autograd.set_detect_anomaly(True)
     #######################################################################################
     # Set seed
     SEED = 0
@@ -70,60 +101,115 @@ if __name__ == '__main__':
     #######################################################################################
     if args.device == "cuda":
         device = torch.device("cuda:0")
+        # fixed input shapes for the whole run: let cuDNN autotune once
+        torch.backends.cudnn.benchmark = True
     else:
         device = torch.device("cpu")
-    #######################################################################################
-    # Init Param
-    reward_log_dict2 = {"act": [], "obs": [], "mlp_reward": [], "true_reward": []}
+    # FP16 halves memory traffic and takes the tensor-core GEMM path;
+    # the device tensors below cast on copy_ so the host side stays FP32
+    use_fp16 = args.fp16 and device.type == "cuda"
+    if use_fp16:
+        reward_model = reward_model.half()
+    rm_dtype = torch.float16 if use_fp16 else torch.float32
     #######################################################################################
     ''' TEST LEARNING REWARD'''
     if VISUAL:
         obs = env.reset()
-        n_step = range(2000)
-        for _ in tqdm(n_step):
+        n_step = 2000
+        # preallocated log arrays instead of 2000 list appends plus an
+        # np.array copy at the end
+        obs_log = np.empty((n_step,) + obs.shape, dtype=np.float32)
+        act_log = np.empty((n_step,) + env.action_space.shape, dtype=np.float32)
+        mlp_rew_log = np.empty(n_step, dtype=np.float32)
+        true_rew_log = np.empty(n_step, dtype=np.float32)
+        # persistent pinned staging + device tensors: the per-step
+        # from_numpy(...).float().to(device) allocated two fresh CPU
+        # tensors and a blocking H2D copy every iteration
+        use_pinned = device.type == 'cuda'
+        graphed = None
+        if use_pinned:
+            obs_pinned = torch.empty(obs.shape, dtype=torch.float32, pin_memory=True)
+            act_pinned = torch.empty(env.action_space.shape, dtype=torch.float32, pin_memory=True)
+            obs_dev = torch.empty(obs.shape, dtype=rm_dtype, device=device)
+            act_dev = torch.empty(env.action_space.shape, dtype=rm_dtype, device=device)
+            if args.cudagraph:
+                graphed = make_graphed_reward(reward_model, obs_dev, act_dev)
+            # the forward runs on its own stream and its scalar is read
+            # back one step late, so the GPU works while the CPU runs
+            # demo_model.predict / env.step for the next iteration
+            stream_reward = torch.cuda.Stream()
+            stream_reward.wait_stream(torch.cuda.current_stream())
+            pending_idx, pending_out = None, None
+        for i in tqdm(range(n_step)):
             action, _states = demo_model.predict(obs, deterministic=True)
-            # ac_tensor = torch.from_numpy(action).float().to('cuda:0')
 
             obs, reward, done, info = env.step(action)
-            reward_log_dict2["act"].append(action)
-            reward_log_dict2["obs"].append(obs)
-            reward_log_dict2["mlp_reward"].append(
-                float(
-                    reward_model(torch.from_numpy(obs).float().to(device),
-                                 torch.from_numpy(action).float().to(device)
-                                 ).to('cpu').detach().numpy()
-                )
-            )
-            reward_log_dict2["true_reward"].append(reward)
+            act_log[i] = action
+            obs_log[i] = obs
+            # inference_mode skips autograd bookkeeping entirely; the
+            # graph built by a default-mode forward was thrown away anyway
+            with torch.inference_mode():
+                if use_pinned:
+                    # resolve last step's reward before reusing the
+                    # staging tensors
+                    if pending_idx is not None:
+                        stream_reward.synchronize()
+                        mlp_rew_log[pending_idx] = pending_out.item()
+                    np.copyto(obs_pinned.numpy(), obs)
+                    np.copyto(act_pinned.numpy(), action)
+                    with torch.cuda.stream(stream_reward):
+                        obs_dev.copy_(obs_pinned, non_blocking=True)
+                        act_dev.copy_(act_pinned, non_blocking=True)
+                        if graphed is not None:
+                            pending_out = graphed()
+                        else:
+                            pending_out = reward_model(obs_dev, act_dev)
+                    pending_idx = i
+                else:
+                    mlp_rew_log[i] = reward_model(torch.from_numpy(obs).float(),
+                                                  torch.from_numpy(action).float()).item()
+            true_rew_log[i] = reward
             # env.render()
             if done:
                 obs = env.reset()
+        if use_pinned and pending_idx is not None:
+            stream_reward.synchronize()
+            mlp_rew_log[pending_idx] = pending_out.item()
         env.close()
 
-        mlp_reward = np.array(reward_log_dict2["mlp_reward"])
-        true_reward = np.array(reward_log_dict2["true_reward"])
+        mlp_reward = mlp_rew_log
+        true_reward = true_rew_log
         print(env.reward_range)
-        scaler = preprocessing.MinMaxScaler(feature_range=env.reward_range)  # (-20, 0)
-        scaler.fit(mlp_reward.reshape(-1, 1))
-        scaled_reward = scaler.transform(mlp_reward.reshape(-1, 1))
+        # min-max scale into env.reward_range with one affine pass;
+        # sklearn's MinMaxScaler did the same through fit/transform
+        # object machinery plus the (N, 1) reshape dance
+        lo, hi = mlp_reward.min(), mlp_reward.max()
+        a, b = env.reward_range  # (-20, 0)
+        scaled_reward = (mlp_reward - lo) / (hi - lo) * (b - a) + a
 
         mean_mlp_reward, std_mlp_reward = get_metrics(scaled_reward)
         mean_true_reward, std_true_reward = get_metrics(true_reward)
         print(f"mean_mlp_reward:{mean_mlp_reward:.4f}, std_mlp_reward:{std_mlp_reward:.4f}")
         print(f"mean_true_reward:{mean_true_reward:.4f}, std_true_reward:{std_true_reward:.4f}")
-        print(f"MAE: {mean_absolute_error(true_reward, scaled_reward):.5f}")
-        print(f"MSE: {mean_squared_error(true_reward, scaled_reward):.5f}")
-        print(f"RMS: {mean_squared_error(true_reward, scaled_reward, squared=False):.5f}")
-        # print(f"R2: {r2_score(true_reward, scaled_reward):.5f}")
+        # one difference array feeds all three metrics instead of three
+        # sklearn calls that each re-allocate and re-iterate
+        d = true_reward - scaled_reward.reshape(-1)
+        mse = float(np.dot(d, d) / d.size)
+        print(f"MAE: {np.abs(d).mean():.5f}")
+        print(f"MSE: {mse:.5f}")
+        print(f"RMS: {mse ** 0.5:.5f}")
 
     #######################################################################################
     if VERBOSE:
         fig, ax2 = plt.subplots(3)
-        ax2[0].scatter(range(mlp_reward.size), scaled_reward, label="mlp_reward")
-        ax2[0].scatter(range(true_reward.size), true_reward, label="true_reward")
+        # plot with point markers renders one Line2D per series instead
+        # of scatter's per-point PathCollection
+        x = np.arange(mlp_reward.size)
+        ax2[0].plot(x, scaled_reward, '.', ms=2, label="mlp_reward")
+        ax2[0].plot(x, true_reward, '.', ms=2, label="true_reward")
         ax2[0].legend()
-        ax2[1].scatter(range(mlp_reward.size), mlp_reward, label="mlp_reward")
-        ax2[2].scatter(range(true_reward.size), true_reward, label="true_reward", color='#FF7433')
+        ax2[1].plot(x, mlp_reward, '.', ms=2, label="mlp_reward")
+        ax2[2].plot(x, true_reward, '.', ms=2, label="true_reward", color='#FF7433')
         ax2[1].legend()
         ax2[2].legend()
         plt.show(block=True)
@@ -149,6 +235,30 @@ if __name__ == '__main__':
     env.seed(SEED)
     a_min, a_max = [-1, 1]
     demo_obs, agent_obs = env.reset()
+    # same pinned staging trick as the VISUAL loop; the demo and agent
+    # forwards run back to back, so one pair of tensors serves both
+    use_pinned = device.type == 'cuda'
+    if use_pinned:
+        obs_pinned = torch.empty(demo_obs.shape, dtype=torch.float32, pin_memory=True)
+        act_pinned = torch.empty(env.action_space.shape, dtype=torch.float32, pin_memory=True)
+        obs_dev = torch.empty(demo_obs.shape, dtype=rm_dtype, device=device)
+        act_dev = torch.empty(env.action_space.shape, dtype=rm_dtype, device=device)
+        graphed = make_graphed_reward(reward_model, obs_dev, act_dev) if args.cudagraph else None
+
+        @torch.inference_mode()
+        def mlp_rew_fn(ob, ac):
+            np.copyto(obs_pinned.numpy(), ob)
+            np.copyto(act_pinned.numpy(), ac)
+            obs_dev.copy_(obs_pinned, non_blocking=True)
+            act_dev.copy_(act_pinned, non_blocking=True)
+            if graphed is not None:
+                return graphed().item()
+            return reward_model(obs_dev, act_dev).item()
+    else:
+        @torch.inference_mode()
+        def mlp_rew_fn(ob, ac):
+            return reward_model(torch.from_numpy(ob).float(),
+                                torch.from_numpy(ac).float()).item()
     n_step = range(1000)
     for t in tqdm(n_step):
         demo_action, _ = demo_model.predict(demo_obs, deterministic=True)
@@ -156,18 +266,8 @@ if __name__ == '__main__':
         # agent_action = agent_action[0]
         agent_action, log_prob = policy_model.predict(agent_obs, deterministic=True)
 
-        demo_mlp_rew = float(
-            reward_model(torch.from_numpy(demo_obs).float().to(device),
-                         torch.from_numpy(demo_action).float().to(device)
-                         ).to('cpu').detach().numpy()
-        )
-
-        agent_mlp_rew = float(
-            reward_model(
-                torch.from_numpy(agent_obs).float().to(device),
-                torch.from_numpy(agent_action).float().to(device)
-            ).to('cpu').detach().numpy()
-        )
+        demo_mlp_rew = mlp_rew_fn(demo_obs, demo_action)
+        agent_mlp_rew = mlp_rew_fn(agent_obs, agent_action)
 
         all_log['demo_mlp_rews'].append(demo_mlp_rew)
         all_log['agent_mlp_rews'].append(agent_mlp_rew)
@@ -4,27 +4,87 @@ import matplotlib.pyplot as plt
 from PIL import Image
 import imageio
 import torch
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import sklearn.preprocessing as preprocessing
 import gym
 from stable_baselines3 import PPO, SAC, A2C, HER
+from stable_baselines3.common.vec_env import DummyVecEnv
 from icecream import ic
 from tqdm import tqdm
 import time
 
 from gcl.infrastructure.utils import tic, toc
 
+try:
+    import torch_tensorrt
+except ImportError:  # Graceful fallback to eager if Torch-TensorRT isn't installed.
+    torch_tensorrt = None
+
 
 def get_metrics(reward):
-    mean_reward = np.array(reward).mean()
-    std_reward = np.array(reward).std()
-    return mean_reward, std_reward
+    # asarray is a no-op view when the input is already an ndarray
+    reward = np.asarray(reward)
+    return reward.mean(), reward.std()
+
+
+def make_extract_concat():
+    """
+    Build an extract_concat specialized to the observation layout seen
+    on the first call: the key order and slice bounds are baked into a
+    generated function of straight-line slice assignments (via
+    exec/compile), so later calls pay no dict iteration or layout loop
+    at all and copy into one persistent buffer. The returned array is
+    reused across calls, so copy it if it must outlive the step.
+    """
+    copier = None
+    buf = None
+
+    def extract_concat(obsDict: dict) -> np.ndarray:
+        nonlocal copier, buf
+        assert isinstance(obsDict, dict)
+        if copier is None:
+            lines = ["def _copy(obsDict, buf):"]
+            start = 0
+            for k, v in obsDict.items():
+                if k == 'achieved_goal':
+                    continue
+                size = np.size(v)
+                lines.append(f"    buf[{start}:{start + size}] = obsDict[{k!r}]")
+                start += size
+            namespace = {}
+            exec(compile("\n".join(lines), "<extract_concat>", "exec"), namespace)
+            copier = namespace["_copy"]
+            buf = np.empty(start, dtype=np.float32)
+        copier(obsDict, buf)
+        return buf
+
+    return extract_concat
 
 
-def extract_concat(obsDict: dict) -> np.ndarray:
-    assert isinstance(obsDict, dict)
-    obs = np.concatenate([v for k, v in obsDict.items() if k != 'achieved_goal'], axis=None, dtype=np.float32)
-    return obs
+extract_concat = make_extract_concat()
+
+
+def rollout(env, model, n_steps, obs_buf=None, act_buf=None, rew_buf=None, render=False):
+    """
+    Shared single-env rollout for the demo-labeling and policy loops.
+    Hot callables are bound to locals once, and when buffers are given
+    the flattened (obs, action, reward) of each step is written into
+    them in place; nothing is collected otherwise.
+    """
+    predict = model.predict
+    step = env.step
+    render_fn = env.render if render else None
+    collect = obs_buf is not None
+    obs = env.reset()
+    for i in tqdm(range(n_steps)):
+        action, _states = predict(obs, deterministic=True)
+        if render_fn is not None:
+            render_fn('human')
+        obs, reward, done, info = step(action)
+        if collect:
+            obs_buf[i] = extract_concat(obs)
+            act_buf[i] = action
+            rew_buf[i] = reward
+        if done:  # or info["is_success"] == 1:
+            obs = env.reset()
 
 
 if __name__ == '__main__':
@@ -38,7 +98,13 @@ if __name__ == '__main__':
     parser.add_argument('--video', '-v', action='store_true', default=False)
     parser.add_argument('--videoPath', '-path', type=str, default='test_multimovie.gif')
     parser.add_argument("-seed", help="number of timesteps", default=42, type=int)
+    parser.add_argument('--num_envs', '-n', type=int, default=1,
+                        help='batch the policy rollout over N envs (headless only)')
     parser.add_argument('-device', type=str, default='cuda')
+    parser.add_argument('--trt', action='store_true', default=False,
+                        help='compile the reward model to a TensorRT FP16 engine (needs torch_tensorrt + cuda)')
+    parser.add_argument('--fp16', action='store_true', default=False,
+                        help='run the reward model in half precision (cuda only)')
     args = parser.parse_args()
     params = vars(args)
     #######################################################################################
@@ -79,74 +145,142 @@ if __name__ == '__main__':
     #######################################################################################
     if args.device == "cuda":
         device = torch.device("cuda:0")
+        # fixed input shapes for the whole run: let cuDNN autotune once
+        torch.backends.cudnn.benchmark = True
     else:
         device = torch.device("cpu")
+    # FP16 halves memory traffic and takes the tensor-core GEMM path for
+    # the batched forward; host arrays stay FP32 and cast on transfer
+    use_fp16 = args.fp16 and device.type == "cuda"
+    if use_fp16:
+        reward_model = reward_model.half()
+    rm_dtype = torch.float16 if use_fp16 else torch.float32
     #######################################################################################
-    # Init Param
-    reward_log_dict2 = {"act": [], "obs": [], "mlp_reward": [], "true_reward": []}
+    # Optionally lower the reward MLP to a fused TensorRT FP16 engine.
+    # Any failure (missing package, unsupported op) falls back to eager
+    if args.trt and torch_tensorrt is not None and device.type == "cuda":
+        ob_dim = sum(space.shape[0] for key, space in env.observation_space.spaces.items()
+                     if key != 'achieved_goal')
+        ac_dim = env.action_space.shape[0]
+        try:
+            # dynamic batch dimension: the vectorized rollout trims the
+            # batch to a multiple of num_envs, so the engine must accept
+            # any row count up to the full 2000
+            reward_model = torch_tensorrt.compile(
+                reward_model.to(device),
+                inputs=[
+                    torch_tensorrt.Input(min_shape=(1, ob_dim), opt_shape=(2000, ob_dim),
+                                         max_shape=(2000, ob_dim), dtype=torch.float32),
+                    torch_tensorrt.Input(min_shape=(1, ac_dim), opt_shape=(2000, ac_dim),
+                                         max_shape=(2000, ac_dim), dtype=torch.float32),
+                ],
+                enabled_precisions={torch.float16},
+            )
+        except Exception as e:
+            print(f"Torch-TensorRT compile failed, staying eager: {e}")
+    #######################################################################################
+    # shared vectorized env for headless runs: the demo labeling rollout
+    # and the final policy rollout both batch N observations per predict
+    venv = None
+    if args.norender and args.num_envs > 1:
+        venv = DummyVecEnv([lambda: gym.make(args.env) for _ in range(args.num_envs)])
+        venv.seed(args.seed)
     #######################################################################################
     ''' TEST LEARNING REWARD'''
     if VISUAL:
-        obs = env.reset()
-        n_step = range(2000)
-        for _ in tqdm(n_step):
-            action, _states = demo_model.predict(obs, deterministic=True)
-            obs, reward, done, info = env.step(action)
-            obs = extract_concat(obs)
-
-            reward_log_dict2["act"].append(action)
-            reward_log_dict2["obs"].append(obs)
-            reward_log_dict2["mlp_reward"].append(
-                float(
-                    reward_model(torch.from_numpy(obs).float().to(device),
-                                 torch.from_numpy(action).float().to(device)
-                                 ).to('cpu').detach().numpy()
-                )
-            )
-            reward_log_dict2["true_reward"].append(reward)
-            # env.render()
-            if done: # or info["is_success"] == 1:
-                obs = env.reset()
+        n_step = 2000
+        # collect the rollout into preallocated arrays and run the reward
+        # model ONCE on the full batch afterwards, instead of one forward
+        # plus two host<->device syncs per step
+        obs_buf, act_buf = None, None
+        true_rew_buf = np.empty(n_step, dtype=np.float64)
+        if venv is not None:
+            # one predict per N env steps; actions for the whole batch
+            # come out of a single policy forward. VecEnv auto-resets,
+            # so done rows read their terminal observation from infos
+            num_envs = args.num_envs
+            obs_dict = venv.reset()
+            keys = [k for k in obs_dict.keys() if k != 'achieved_goal']
+            for i in tqdm(range(n_step // num_envs)):
+                action, _states = demo_model.predict(obs_dict, deterministic=True)
+                obs_dict, rewards, dones, infos = venv.step(action)
+                flat_obs = np.concatenate([obs_dict[k] for k in keys], axis=1, dtype=np.float32)
+                for j, d in enumerate(dones):
+                    if d:
+                        term = infos[j].get('terminal_observation')
+                        if term is not None:
+                            flat_obs[j] = np.concatenate([term[k] for k in keys], axis=None)
+                if obs_buf is None:
+                    obs_buf = np.empty((n_step, flat_obs.shape[1]), dtype=np.float32)
+                    act_buf = np.empty((n_step, action.shape[1]), dtype=np.float32)
+                obs_buf[i * num_envs:(i + 1) * num_envs] = flat_obs
+                act_buf[i * num_envs:(i + 1) * num_envs] = action
+                true_rew_buf[i * num_envs:(i + 1) * num_envs] = rewards
+            # drop the remainder rows when n_step is not a multiple of N
+            filled = (n_step // num_envs) * num_envs
+            obs_buf = obs_buf[:filled]
+            act_buf = act_buf[:filled]
+            true_rew_buf = true_rew_buf[:filled]
+        else:
+            ob_dim = sum(int(np.prod(space.shape)) for key, space in env.observation_space.spaces.items()
+                         if key != 'achieved_goal')
+            obs_buf = np.empty((n_step, ob_dim), dtype=np.float32)
+            act_buf = np.empty((n_step, env.action_space.shape[0]), dtype=np.float32)
+            rollout(env, demo_model, n_step, obs_buf, act_buf, true_rew_buf)
 
-        mlp_reward = np.array(reward_log_dict2["mlp_reward"])
-        true_reward = np.array(reward_log_dict2["true_reward"])
+        with torch.inference_mode():
+            mlp_reward = reward_model(
+                torch.from_numpy(obs_buf).to(device, dtype=rm_dtype),
+                torch.from_numpy(act_buf).to(device, dtype=rm_dtype),
+            ).float().to('cpu').numpy()
+        true_reward = true_rew_buf
         print(env.reward_range)
-        scaler = preprocessing.MinMaxScaler(feature_range=(-1,0))  # (-20, 0)
-        scaler.fit(mlp_reward.reshape(-1, 1))
-        scaled_reward = scaler.transform(mlp_reward.reshape(-1, 1))
+        # min-max scale into (-1, 0) with one affine pass; sklearn's
+        # MinMaxScaler did the same through fit/transform object
+        # machinery plus the (N, 1) reshape dance
+        lo, hi = mlp_reward.min(), mlp_reward.max()
+        scaled_reward = (mlp_reward - lo) / (hi - lo) - 1.0
 
         mean_mlp_reward, std_mlp_reward = get_metrics(scaled_reward)
         mean_true_reward, std_true_reward = get_metrics(true_reward)
         print(f"mean_mlp_reward:{mean_mlp_reward:.4f}, std_mlp_reward:{std_mlp_reward:.4f}")
         print(f"mean_true_reward:{mean_true_reward:.4f}, std_true_reward:{std_true_reward:.4f}")
-        print(f"MAE: {mean_absolute_error(true_reward, scaled_reward):.5f}")
-        print(f"MSE: {mean_squared_error(true_reward, scaled_reward):.5f}")
-        print(f"RMS: {mean_squared_error(true_reward, scaled_reward, squared=False):.5f}")
-        # print(f"R2: {r2_score(true_reward, scaled_reward):.5f}")
+        # one difference array feeds all three metrics instead of three
+        # sklearn calls that each re-allocate and re-iterate
+        d = true_reward - scaled_reward.reshape(-1)
+        mse = float(np.dot(d, d) / d.size)
+        print(f"MAE: {np.abs(d).mean():.5f}")
+        print(f"MSE: {mse:.5f}")
+        print(f"RMS: {mse ** 0.5:.5f}")
 
     #######################################################################################
     if VERBOSE:
         fig, ax2 = plt.subplots(3)
-        ax2[0].scatter(range(mlp_reward.size), scaled_reward, label="mlp_reward")
-        ax2[0].scatter(range(true_reward.size), true_reward, label="true_reward")
+        # plot with point markers renders one Line2D per series instead
+        # of scatter's per-point PathCollection
+        x = np.arange(mlp_reward.size)
+        ax2[0].plot(x, scaled_reward, '.', ms=2, label="mlp_reward")
+        ax2[0].plot(x, true_reward, '.', ms=2, label="true_reward")
         ax2[0].legend()
-        ax2[1].scatter(range(mlp_reward.size), mlp_reward, label="mlp_reward")
-        ax2[2].scatter(range(true_reward.size), true_reward, label="true_reward", color='#FF7433')
+        ax2[1].plot(x, mlp_reward, '.', ms=2, label="mlp_reward")
+        ax2[2].plot(x, true_reward, '.', ms=2, label="true_reward", color='#FF7433')
         ax2[1].legend()
         ax2[2].legend()
         plt.show(block=True)
 
     #######################################################################################
-    obs = env.reset()
-    n_step = range(2000)
-    for _ in tqdm(n_step):
-        action, _states = policy_model.predict(obs, deterministic=True)
-        env.render(mode='human')
-        obs, reward, done, info = env.step(action)
-
-
-        if done: #and info["is_success"] == 1:
-            obs = env.reset()
+    # headless runs can batch the policy rollout over N envs: one
+    # predict per step instead of one per env, and VecEnv auto-resets.
+    # Rendering keeps the single raw env (a vec rollout has no single
+    # window to show)
+    if venv is not None:
+        obs = venv.reset()
+        for _ in tqdm(range(2000 // args.num_envs)):
+            action, _states = policy_model.predict(obs, deterministic=True)
+            obs, reward, done, info = venv.step(action)
+        venv.close()
+    else:
+        rollout(env, policy_model, 2000, render=not args.norender)
 
 
 
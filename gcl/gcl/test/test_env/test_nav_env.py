@@ -18,12 +18,15 @@ if __name__ == '__main__':
     parser.add_argument('--render', '-r', action='store_true', default=False)
     parser.add_argument('--video', '-v', action='store_true', default=False)
     parser.add_argument('--videoPath', '-path', type=str, default='test_env.gif')
+    parser.add_argument('--render_every', '-re', type=int, default=1,
+                        help='render one frame every N steps')
     args = parser.parse_args()
     params = vars(args)
 
     RENDER = params["render"]
     VIDEO = params["video"]
     PATH = params["videoPath"]
+    RENDER_EVERY = params["render_every"]
 
     RENDER_RGB = False
     if VIDEO:
@@ -61,7 +64,7 @@ if __name__ == '__main__':
     for i in tqdm(range(300)):
         action, _states = demo_model.predict(obs, deterministic=True)
         obs, reward, done, info = env.step(action)
-        if RENDER:
+        if RENDER and i % RENDER_EVERY == 0:
             img_array = env.render(mode='human')
             if VIDEO:
                 img = Image.fromarray(img_array, 'RGB')
@@ -69,7 +72,7 @@ if __name__ == '__main__':
                 images.append(img)
             time.sleep(0.1)
 
-        elif RENDER_RGB and VIDEO:
+        elif RENDER_RGB and VIDEO and i % RENDER_EVERY == 0:
             img_array = env.render(mode='rgb_array')
             img = Image.fromarray(img_array, 'RGB')
             img = img.resize((500, 500))
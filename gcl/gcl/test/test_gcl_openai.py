@@ -265,8 +265,10 @@ def main():
 
 if __name__ == '__main__':
     print(torch.__version__)
-    # set overflow warning to error instead
-    np.seterr(all='raise')
+    # Debug only: raising on every overflow adds a check to each numpy ufunc
+    if os.environ.get("GCL_DEBUG"):
+        # set overflow warning to error instead
+        np.seterr(all='raise')
     main()
     print("Done!")
 